@@ -1,16 +1,76 @@
 import logging
 from typing import Any
+from urllib.parse import urlparse
 
 import aiohttp
 import requests
+from arpakitlib.ar_circuit_breaker_util import CircuitBreakerRegistry, CircuitBreaker
 from arpakitlib.ar_dict_util import combine_dicts
-from arpakitlib.ar_http_request_util import async_make_http_request, sync_make_http_request
+from arpakitlib.ar_http_request_util import async_make_http_request, sync_make_http_request, AsyncHTTPSessionPool, \
+    SyncHTTPSessionPool, get_status_and_retry_after_from_exception
+from arpakitlib.ar_http_response_cache_util import HTTPResponseCache, CachedHTTPResponse, \
+    sync_make_cached_http_request, async_make_cached_http_request
+from arpakitlib.ar_rate_limiter_util import RequestLimiter, RateLimiterTimeoutError
+from arpakitlib.ar_retry_func_util import RetryPolicy
+
+
+def is_http_failure_for_circuit_breaker(*, exception: BaseException | None = None, status: int | None = None) -> bool:
+    # client errors (4xx except 429) mean that upstream is alive
+    if exception is not None:
+        status, _ = get_status_and_retry_after_from_exception(exception)
+        if status is None:
+            return True
+    if status is None:
+        return False
+    return status >= 500 or status == 429
 
 
 class BaseHTTPAPIClient:
-    def __init__(self):
+    def __init__(
+            self,
+            *,
+            async_http_session_pool: AsyncHTTPSessionPool | None = None,
+            sync_http_session_pool: SyncHTTPSessionPool | None = None,
+            retry_policy: RetryPolicy | None = None,
+            circuit_breaker_registry: CircuitBreakerRegistry | None = None,
+            request_limiter: RequestLimiter | None = None,
+            endpoint_to_request_limiter: dict[str, RequestLimiter] | None = None,
+            http_response_cache: HTTPResponseCache | None = None
+    ):
         self.headers = {"Content-Type": "application/json"}
         self._logger = logging.getLogger(f"{self.__class__.__name__}")
+        self.async_http_session_pool = async_http_session_pool
+        self.sync_http_session_pool = sync_http_session_pool
+        self.retry_policy = retry_policy
+        self.circuit_breaker_registry = circuit_breaker_registry
+        self.request_limiter = request_limiter
+        # endpoint is url path prefix, the longest matching prefix is used together with request_limiter
+        self.endpoint_to_request_limiter = endpoint_to_request_limiter if endpoint_to_request_limiter is not None else {}
+        self.http_response_cache = http_response_cache
+
+    def _get_circuit_breaker(self, *, url: str) -> CircuitBreaker | None:
+        if self.circuit_breaker_registry is None:
+            return None
+        return self.circuit_breaker_registry.get(urlparse(url).netloc)
+
+    def _get_request_limiters(self, *, url: str) -> list[RequestLimiter]:
+        request_limiters = []
+        if self.request_limiter is not None:
+            request_limiters.append(self.request_limiter)
+        if self.endpoint_to_request_limiter:
+            path = urlparse(url).path
+            matched_endpoint = None
+            for endpoint in self.endpoint_to_request_limiter.keys():
+                if path.startswith(endpoint) and (matched_endpoint is None or len(endpoint) > len(matched_endpoint)):
+                    matched_endpoint = endpoint
+            if matched_endpoint is not None:
+                request_limiters.append(self.endpoint_to_request_limiter[matched_endpoint])
+        return request_limiters
+
+    def get_circuit_breakers_metrics(self) -> list[dict[str, Any]]:
+        if self.circuit_breaker_registry is None:
+            return []
+        return self.circuit_breaker_registry.get_metrics()
 
     def _sync_make_http_request(
             self,
@@ -20,25 +80,137 @@ class BaseHTTPAPIClient:
             headers: dict[str, Any] | None = None,
             **kwargs
     ) -> requests.Response:
-        return sync_make_http_request(
+        if self.sync_http_session_pool is not None:
+            kwargs.setdefault("session_pool_", self.sync_http_session_pool)
+        if self.retry_policy is not None:
+            kwargs.setdefault("retry_policy_", self.retry_policy)
+
+        # open circuit breaker fails fast without waiting for limiters,
+        # limiters are applied to every try inside
+        kwargs.setdefault("request_limiters_", self._get_request_limiters(url=url))
+
+        circuit_breaker = self._get_circuit_breaker(url=url)
+        if circuit_breaker is not None:
+            circuit_breaker.before_call()
+        try:
+            response = sync_make_http_request(
+                method=method,
+                url=url,
+                headers=combine_dicts(self.headers, (headers if headers is not None else {})),
+                **kwargs
+            )
+        except RateLimiterTimeoutError:
+            if circuit_breaker is not None:
+                circuit_breaker.on_ignore()
+            raise
+        except Exception as exception:
+            if circuit_breaker is not None:
+                if is_http_failure_for_circuit_breaker(exception=exception):
+                    circuit_breaker.on_failure(exception)
+                else:
+                    circuit_breaker.on_success()
+            raise
+        except BaseException:
+            if circuit_breaker is not None:
+                circuit_breaker.on_ignore()
+            raise
+        if circuit_breaker is not None:
+            if is_http_failure_for_circuit_breaker(status=response.status_code):
+                circuit_breaker.on_failure()
+            else:
+                circuit_breaker.on_success()
+        return response
+
+    async def _async_make_http_request(
+            self,
+            *,
+            method: str = "GET",
+            url: str,
+            headers: dict[str, Any] | None = None,
+            **kwargs
+    ) -> aiohttp.ClientResponse:
+        if self.async_http_session_pool is not None:
+            kwargs.setdefault("session_pool_", self.async_http_session_pool)
+        if self.retry_policy is not None:
+            kwargs.setdefault("retry_policy_", self.retry_policy)
+
+        # open circuit breaker fails fast without waiting for limiters,
+        # limiters are applied to every try inside
+        kwargs.setdefault("request_limiters_", self._get_request_limiters(url=url))
+
+        circuit_breaker = self._get_circuit_breaker(url=url)
+        if circuit_breaker is not None:
+            circuit_breaker.before_call()
+        try:
+            response = await async_make_http_request(
+                method=method,
+                url=url,
+                headers=combine_dicts(self.headers, (headers if headers is not None else {})),
+                **kwargs
+            )
+        except RateLimiterTimeoutError:
+            if circuit_breaker is not None:
+                circuit_breaker.on_ignore()
+            raise
+        except Exception as exception:
+            if circuit_breaker is not None:
+                if is_http_failure_for_circuit_breaker(exception=exception):
+                    circuit_breaker.on_failure(exception)
+                else:
+                    circuit_breaker.on_success()
+            raise
+        except BaseException:
+            if circuit_breaker is not None:
+                circuit_breaker.on_ignore()
+            raise
+        if circuit_breaker is not None:
+            if is_http_failure_for_circuit_breaker(status=response.status):
+                circuit_breaker.on_failure()
+            else:
+                circuit_breaker.on_success()
+        return response
+
+    def _get_http_response_cache_scope(self) -> str | None:
+        # override if credentials are not in self.headers (e.g. auth= kwarg), it is hashed in cache key
+        return None
+
+    def _sync_make_cached_http_request(
+            self,
+            *,
+            method: str = "GET",
+            url: str,
+            headers: dict[str, Any] | None = None,
+            **kwargs
+    ) -> CachedHTTPResponse:
+        if self.http_response_cache is None:
+            raise ValueError("http_response_cache is None")
+        return sync_make_cached_http_request(
+            cache=self.http_response_cache,
             method=method,
             url=url,
             headers=combine_dicts(self.headers, (headers if headers is not None else {})),
+            make_http_request_func=self._sync_make_http_request,
+            cache_scope=self._get_http_response_cache_scope(),
             **kwargs
         )
 
-    async def _async_make_http_request(
+    async def _async_make_cached_http_request(
             self,
             *,
             method: str = "GET",
             url: str,
             headers: dict[str, Any] | None = None,
             **kwargs
-    ) -> aiohttp.ClientResponse:
-        return await async_make_http_request(
+    ) -> CachedHTTPResponse:
+        if self.http_response_cache is None:
+            raise ValueError("http_response_cache is None")
+        return await async_make_cached_http_request(
+            cache=self.http_response_cache,
             method=method,
             url=url,
             headers=combine_dicts(self.headers, (headers if headers is not None else {})),
+            make_http_request_func=self._async_make_http_request,
+            cache_scope=self._get_http_response_cache_scope(),
             **kwargs
         )
 
@@ -3,16 +3,27 @@
 import asyncio
 import logging
 import multiprocessing
+import multiprocessing.synchronize
+import signal
 import threading
+import time
 from abc import ABC
-from datetime import timedelta
-from random import randint
+from datetime import timedelta, datetime
+from random import randint, random
 from typing import Any
 from uuid import uuid4
 
+from arpakitlib.ar_datetime_util import now_utc_dt
 from arpakitlib.ar_enumeration_util import Enumeration
 from arpakitlib.ar_func_util import is_async_func, is_sync_func, is_coroutine
-from arpakitlib.ar_sleep_util import sync_safe_sleep, async_safe_sleep
+from arpakitlib.ar_sleep_util import async_safe_sleep
+from arpakitlib.ar_worker_metrics_util import WorkerMetrics, BaseWorkerMetricsExporter, WorkerIterationProfiler
+from arpakitlib.ar_worker_wakeup_util import BaseWorkerWakeupSource
+
+
+class BaseWorkerSyncConcurrencyModes(Enumeration):
+    thread = "thread"
+    process = "process"
 
 
 class BaseWorker(ABC):
@@ -25,11 +36,59 @@ class BaseWorker(ABC):
             worker_name: str | None = None,
             data: dict[str, Any] | None = None,
             timeout_before_safe_run: timedelta | None = None,
+            concurrency: int = 1,
+            sync_concurrency_mode: str = BaseWorkerSyncConcurrencyModes.thread,
+            max_timeout_after_run: timedelta | None = None,
+            timeout_after_run_backoff_factor: float = 2.0,
+            min_idle_timeout_after_run: timedelta = timedelta(seconds=0.1),
+            wakeup_source: BaseWorkerWakeupSource | None = None,
+            metrics_exporters: list[BaseWorkerMetricsExporter] | None = None,
+            metrics_export_interval: timedelta = timedelta(seconds=60),
+            slow_iteration_threshold: timedelta | None = None,
+            profile_sample_rate: float = 0.0,
             **kwargs
     ):
+        if concurrency < 1:
+            raise ValueError("concurrency < 1")
+        BaseWorkerSyncConcurrencyModes.parse_and_validate_values(sync_concurrency_mode)
+        # concurrency slots run sync_run/async_run in parallel after one startup,
+        # async_safe_run uses tasks, sync_safe_run uses threads or forked processes
+        self.concurrency = concurrency
+        self.sync_concurrency_mode = sync_concurrency_mode
+
         self.timeout_after_run = timeout_after_run
         self.timeout_after_error_in_run = timeout_after_error_in_run
 
+        # adaptive polling is used if max_timeout_after_run is set and sync_run/async_run return count of done work:
+        # after work next run is immediate, while idle timeout grows from timeout_after_run to max_timeout_after_run,
+        # min_idle_timeout_after_run is the floor of idle timeout, so idle worker with timeout_after_run=0 does not spin
+        if timeout_after_run_backoff_factor < 1:
+            raise ValueError("timeout_after_run_backoff_factor < 1")
+        if max_timeout_after_run is not None and min_idle_timeout_after_run <= timedelta(seconds=0):
+            raise ValueError("min_idle_timeout_after_run <= 0 with max_timeout_after_run")
+        self.max_timeout_after_run = max_timeout_after_run
+        self.timeout_after_run_backoff_factor = timeout_after_run_backoff_factor
+        self.min_idle_timeout_after_run = min_idle_timeout_after_run
+        self._current_timeout_after_run = timeout_after_run
+
+        # with wakeup_source timeout after run is max idle time, next run starts as soon as wakeup_source is notified,
+        # in process mode wakeup_source is started before fork and shared by slot processes
+        self.wakeup_source = wakeup_source
+
+        # metrics are collected always, exporters get snapshot every metrics_export_interval and on stop,
+        # profile_sample_rate of iterations run under cProfile, profile is kept if iteration is slow
+        # (or always if slow_iteration_threshold is None), in process mode every process has own metrics
+        if not 0 <= profile_sample_rate <= 1:
+            raise ValueError("profile_sample_rate must be in [0, 1]")
+        self.metrics = WorkerMetrics()
+        self.metrics_exporters = metrics_exporters if metrics_exporters is not None else []
+        self.metrics_export_interval = metrics_export_interval
+        self.slow_iteration_threshold = slow_iteration_threshold
+        self.profile_sample_rate = profile_sample_rate
+        self._iteration_profiler = WorkerIterationProfiler()
+        self._metrics_exported_at = time.monotonic()
+        self._metrics_export_lock = threading.Lock()
+
         if startup_funcs is None:
             startup_funcs = []
         self.startup_funcs = startup_funcs
@@ -47,10 +106,126 @@ class BaseWorker(ABC):
 
         self._logger = logging.getLogger(self.worker_fullname)
 
+        self._stop_event: threading.Event | multiprocessing.synchronize.Event = threading.Event()
+        self._async_stop_event: asyncio.Event | None = None
+        self._async_loop: asyncio.AbstractEventLoop | None = None
+
     @property
     def worker_fullname(self) -> str:
         return f"{self.worker_name}_{self.worker_id}"
 
+    @property
+    def current_timeout_after_run(self) -> timedelta:
+        return self._current_timeout_after_run
+
+    def _compute_timeout_after_run(self, run_res: Any) -> timedelta:
+        if self.max_timeout_after_run is None or not isinstance(run_res, int) or isinstance(run_res, bool):
+            self._current_timeout_after_run = self.timeout_after_run
+        elif run_res > 0:
+            self._current_timeout_after_run = timedelta(seconds=0)
+        elif self._current_timeout_after_run <= timedelta(seconds=0):
+            self._current_timeout_after_run = min(
+                max(self.timeout_after_run, self.min_idle_timeout_after_run),
+                self.max_timeout_after_run
+            )
+        else:
+            self._current_timeout_after_run = min(
+                max(
+                    self._current_timeout_after_run * self.timeout_after_run_backoff_factor,
+                    self.min_idle_timeout_after_run
+                ),
+                self.max_timeout_after_run
+            )
+        self.metrics.set_current_timeout_after_run(self._current_timeout_after_run.total_seconds())
+        return self._current_timeout_after_run
+
+    def _start_iteration(self) -> tuple[float, Any]:
+        self.metrics.on_iteration_start()
+        profile = None
+        if self.profile_sample_rate > 0 and random() < self.profile_sample_rate:
+            profile = self._iteration_profiler.start()
+        return time.perf_counter(), profile
+
+    def _finish_iteration(self, *, started: tuple[float, Any], is_ok: bool | None, run_res: Any = None):
+        # is_ok=None means that iteration was cancelled
+        started_at, profile = started
+        duration = time.perf_counter() - started_at
+        profile_text = self._iteration_profiler.finish(profile) if profile is not None else None
+        if is_ok is None:
+            self.metrics.on_iteration_cancel()
+            return
+        is_slow = self.slow_iteration_threshold is not None and duration >= self.slow_iteration_threshold.total_seconds()
+        work_done = run_res if isinstance(run_res, int) and not isinstance(run_res, bool) else None
+        self.metrics.on_iteration_finish(duration=duration, is_ok=is_ok, work_done=work_done, is_slow=is_slow)
+        if is_slow:
+            self._logger.warning(f"slow iteration, duration={duration:.3f}s")
+        if profile_text is not None and (self.slow_iteration_threshold is None or is_slow):
+            self.metrics.add_profile(duration=duration, profile_text=profile_text)
+            self._logger.info(f"iteration profile, duration={duration:.3f}s\n{profile_text}")
+        self._export_metrics()
+
+    def _export_metrics(self, *, force: bool = False):
+        if not self.metrics_exporters:
+            return
+        with self._metrics_export_lock:
+            now = time.monotonic()
+            if not force and now - self._metrics_exported_at < self.metrics_export_interval.total_seconds():
+                return
+            self._metrics_exported_at = now
+        snapshot = self.metrics.get_snapshot()
+        for metrics_exporter in self.metrics_exporters:
+            try:
+                metrics_exporter.export(worker_name=self.worker_name, worker_id=self.worker_id, snapshot=snapshot)
+            except Exception as exception:
+                self._logger.error(f"exception in metrics export, exporter={metrics_exporter}", exc_info=exception)
+
+    def get_metrics_snapshot(self) -> dict[str, Any]:
+        return self.metrics.get_snapshot()
+
+    @property
+    def is_stopping(self) -> bool:
+        return self._stop_event.is_set()
+
+    def stop(self):
+        # cooperative stop, slots finish current iteration and exit, can be called from any thread
+        self._stop_event.set()
+        if self._async_loop is not None and self._async_stop_event is not None:
+            try:
+                self._async_loop.call_soon_threadsafe(self._async_stop_event.set)
+            except RuntimeError:  # loop is closed
+                pass
+
+    def _use_multiprocessing_stop_event(self):
+        # must be called before worker is started in other process, so stop() in parent is seen in child
+        if isinstance(self._stop_event, threading.Event):
+            is_set = self._stop_event.is_set()
+            self._stop_event = multiprocessing.get_context("fork").Event()
+            if is_set:
+                self._stop_event.set()
+
+    def _sync_sleep(self, timeout: timedelta | float | None):
+        if timeout is None:
+            return
+        if isinstance(timeout, timedelta):
+            timeout = timeout.total_seconds()
+        if timeout > 0:
+            self._stop_event.wait(timeout)
+
+    async def _async_sleep(self, timeout: timedelta | float | None):
+        if timeout is None:
+            return
+        if isinstance(timeout, timedelta):
+            timeout = timeout.total_seconds()
+        if timeout <= 0:
+            return
+        if self._async_stop_event is None:
+            await async_safe_sleep(timeout)
+            return
+        try:
+            await asyncio.wait_for(self._async_stop_event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
     def sync_run_startup_funcs(self):
         self._logger.info("start")
         for startup_func in self.startup_funcs:
@@ -70,33 +245,168 @@ class BaseWorker(ABC):
     def sync_on_startup(self):
         self.sync_run_startup_funcs()
 
-    def sync_run(self):
+    def sync_run(self) -> int | None:
+        # may return count of done work for adaptive polling
         pass
 
     def sync_on_error(self, exception: Exception, **kwargs):
         pass
 
+    def _sync_wait_for_next_run(self, timeout: timedelta):
+        if self.wakeup_source is None:
+            self._sync_sleep(timeout)
+            return
+        # waits in parts to see stop, on wakeup_source error waits as without it
+        deadline = time.monotonic() + timeout.total_seconds()
+        while not self.is_stopping:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                if self.wakeup_source.sync_wait(min(remaining, 1.0)):
+                    return
+            except Exception:
+                self._logger.exception("exception in wakeup_source.sync_wait")
+                self._sync_sleep(deadline - time.monotonic())
+                return
+
+    async def _async_wait_for_next_run(self, timeout: timedelta):
+        if self.wakeup_source is None or self._async_stop_event is None:
+            await self._async_sleep(timeout)
+            return
+        if timeout <= timedelta(seconds=0) or self.is_stopping:
+            return
+        deadline = time.monotonic() + timeout.total_seconds()
+        wakeup_task = asyncio.create_task(self.wakeup_source.async_wait(timeout.total_seconds()))
+        tasks = [wakeup_task, asyncio.create_task(self._async_stop_event.wait())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        # on wakeup_source error waits as without it
+        if wakeup_task.done() and not wakeup_task.cancelled() and wakeup_task.exception() is not None:
+            self._logger.error("exception in wakeup_source.async_wait", exc_info=wakeup_task.exception())
+            await self._async_sleep(deadline - time.monotonic())
+
+    def _sync_run_slot(self, slot: int = 0):
+        while not self.is_stopping:
+            timeout_after_run = self.timeout_after_run
+            started = self._start_iteration()
+            try:
+                run_res = self.sync_run()
+            except Exception as exception:
+                self._finish_iteration(started=started, is_ok=False)
+                self._logger.error(f"exception in sync_run, slot={slot}", exc_info=exception)
+                try:
+                    self.sync_on_error(exception=exception)
+                except Exception as exception_:
+                    self._logger.error(f"exception in sync_on_error, slot={slot}", exc_info=exception_)
+                    raise
+                sleep_started_at = time.perf_counter()
+                self._sync_sleep(self.timeout_after_error_in_run)
+                self.metrics.on_sleep(time.perf_counter() - sleep_started_at)
+            except BaseException:
+                self._finish_iteration(started=started, is_ok=None)
+                raise
+            else:
+                self._finish_iteration(started=started, is_ok=True, run_res=run_res)
+                timeout_after_run = self._compute_timeout_after_run(run_res)
+            sleep_started_at = time.perf_counter()
+            self._sync_wait_for_next_run(timeout_after_run)
+            self.metrics.on_sleep(time.perf_counter() - sleep_started_at)
+
+    def _sync_run_slot_in_process(self, slot: int):
+        try:
+            self._sync_run_slot(slot=slot)
+        except Exception:
+            raise SystemExit(1)
+
     def sync_safe_run(self):
+        if self.wakeup_source is not None and not self.wakeup_source.is_sync_supported:
+            raise ValueError(f"{self.wakeup_source.__class__.__name__} can not be used in sync_safe_run")
         self._logger.info("start")
         if self.timeout_before_safe_run is not None:
-            sync_safe_sleep(self.timeout_before_safe_run)
+            self._sync_sleep(self.timeout_before_safe_run)
         try:
             self.sync_on_startup()
         except Exception as exception:
             self._logger.error("exception in sync_on_startup", exc_info=exception)
             raise
-        while True:
-            try:
-                self.sync_run()
-            except Exception as exception:
-                self._logger.error("exception in sync_run", exc_info=exception)
+
+        if self.wakeup_source is not None:
+            self.wakeup_source.sync_startup()
+        try:
+            self._sync_run_slots()
+        finally:
+            self._export_metrics(force=True)
+            if self.wakeup_source is not None:
                 try:
-                    self.sync_on_error(exception=exception)
-                except Exception as exception_:
-                    self._logger.error("exception in sync_on_error", exc_info=exception_)
-                    raise
-                sync_safe_sleep(self.timeout_after_error_in_run)
-            sync_safe_sleep(self.timeout_after_run)
+                    self.wakeup_source.sync_shutdown()
+                except Exception as exception:
+                    self._logger.error("exception in wakeup_source.sync_shutdown", exc_info=exception)
+
+    def _sync_run_slots(self):
+        if self.concurrency == 1:
+            self._sync_run_slot(slot=0)
+            self._logger.info("stopped")
+            return
+
+        slot_exceptions: list[Exception] = []
+
+        if self.sync_concurrency_mode == BaseWorkerSyncConcurrencyModes.thread:
+            def _run_slot(slot: int):
+                try:
+                    self._sync_run_slot(slot=slot)
+                except Exception as exception:
+                    slot_exceptions.append(exception)
+
+            threads = [
+                threading.Thread(target=_run_slot, kwargs={"slot": slot}, name=f"{self.worker_fullname}_slot_{slot}")
+                for slot in range(self.concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        elif self.sync_concurrency_mode == BaseWorkerSyncConcurrencyModes.process:
+            # fork is used, so state made in startup is shared by slot processes
+            if multiprocessing.current_process().daemon:
+                raise ValueError(
+                    "worker with process slots can not be run in daemon process, run it with daemon=False"
+                )
+            self._use_multiprocessing_stop_event()
+            processes = [
+                multiprocessing.get_context("fork").Process(
+                    target=self._sync_run_slot_in_process,
+                    kwargs={"slot": slot},
+                    name=f"{self.worker_fullname}_slot_{slot}"
+                )
+                for slot in range(self.concurrency)
+            ]
+            for process in processes:
+                process.start()
+            try:
+                for process in processes:
+                    process.join()
+            except BaseException:
+                self.stop()
+                for process in processes:
+                    process.join()
+                raise
+            for process in processes:
+                if process.exitcode not in (0, None):
+                    slot_exceptions.append(RuntimeError(f"slot process {process.name} exitcode={process.exitcode}"))
+
+        else:
+            raise ValueError(f"unknown sync_concurrency_mode={self.sync_concurrency_mode}")
+
+        self._logger.info("stopped")
+        if slot_exceptions:
+            raise slot_exceptions[0]
 
     async def async_run_startup_funcs(self):
         self._logger.info("start")
@@ -114,33 +424,81 @@ class BaseWorker(ABC):
     async def async_on_startup(self):
         await self.async_run_startup_funcs()
 
-    async def async_run(self):
+    async def async_run(self) -> int | None:
+        # may return count of done work for adaptive polling
         pass
 
     async def async_on_error(self, exception: Exception, **kwargs):
         pass
 
+    async def _async_run_slot(self, slot: int = 0):
+        while not self.is_stopping:
+            timeout_after_run = self.timeout_after_run
+            started = self._start_iteration()
+            try:
+                run_res = await self.async_run()
+            except Exception as exception:
+                self._finish_iteration(started=started, is_ok=False)
+                self._logger.error(f"exception in async_run, slot={slot}", exc_info=exception)
+                try:
+                    await self.async_on_error(exception=exception)
+                except Exception as exception_:
+                    self._logger.error(f"exception in async_on_error, slot={slot}", exc_info=exception_)
+                    raise
+                sleep_started_at = time.perf_counter()
+                await self._async_sleep(self.timeout_after_error_in_run)
+                self.metrics.on_sleep(time.perf_counter() - sleep_started_at)
+            except BaseException:
+                self._finish_iteration(started=started, is_ok=None)
+                raise
+            else:
+                self._finish_iteration(started=started, is_ok=True, run_res=run_res)
+                timeout_after_run = self._compute_timeout_after_run(run_res)
+            sleep_started_at = time.perf_counter()
+            await self._async_wait_for_next_run(timeout_after_run)
+            self.metrics.on_sleep(time.perf_counter() - sleep_started_at)
+
     async def async_safe_run(self):
         self._logger.info("start async_safe_run")
+        self._async_loop = asyncio.get_running_loop()
+        self._async_stop_event = asyncio.Event()
+        if self.is_stopping:
+            self._async_stop_event.set()
         if self.timeout_before_safe_run is not None:
-            await async_safe_sleep(self.timeout_before_safe_run)
+            await self._async_sleep(self.timeout_before_safe_run)
         try:
             await self.async_on_startup()
         except Exception as exception:
             self._logger.error("exception in async_on_startup", exc_info=exception)
             raise
-        while True:
-            try:
-                await self.async_run()
-            except Exception as exception:
-                self._logger.error("exception in async_run", exc_info=exception)
+
+        if self.wakeup_source is not None:
+            await self.wakeup_source.async_startup()
+        try:
+            await self._async_run_slots()
+        finally:
+            self._export_metrics(force=True)
+            if self.wakeup_source is not None:
                 try:
-                    await self.async_on_error(exception=exception)
-                except Exception as exception_:
-                    self._logger.error("exception in async_on_error", exc_info=exception_)
-                    raise
-                await async_safe_sleep(self.timeout_after_error_in_run)
-            await async_safe_sleep(self.timeout_after_run)
+                    await self.wakeup_source.async_shutdown()
+                except Exception as exception:
+                    self._logger.error("exception in wakeup_source.async_shutdown", exc_info=exception)
+
+    async def _async_run_slots(self):
+        if self.concurrency == 1:
+            await self._async_run_slot(slot=0)
+            self._logger.info("stopped")
+            return
+
+        # slot which failed in async_on_error stops alone, others keep working
+        results = await asyncio.gather(
+            *[self._async_run_slot(slot=slot) for slot in range(self.concurrency)],
+            return_exceptions=True
+        )
+        self._logger.info("stopped")
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
 
 
 class SafeRunInBackgroundModes(Enumeration):
@@ -149,21 +507,52 @@ class SafeRunInBackgroundModes(Enumeration):
     process = "process"
 
 
-def safe_run_worker_in_background(*, worker: BaseWorker, mode: str) -> (
+def _sync_safe_run_worker_in_process(worker: BaseWorker):
+    # SIGTERM to process stops worker cooperatively, SIGINT (e.g. ctrl+c for process group) is handled by parent,
+    # handler only sets flag, stop() (multiprocessing.Event.set) is called from watcher thread,
+    # because set in handler deadlocks when main thread is interrupted inside wait of same event
+    stop_requested = False
+
+    def _on_sigterm(*args):
+        nonlocal stop_requested
+        stop_requested = True
+
+    def _watch_stop_requested():
+        while not stop_requested and not worker.is_stopping:
+            time.sleep(0.1)
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, _on_sigterm)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    threading.Thread(target=_watch_stop_requested, daemon=True).start()
+    worker.sync_safe_run()
+
+
+def safe_run_worker_in_background(*, worker: BaseWorker, mode: str, daemon: bool | None = None) -> (
         asyncio.Task | threading.Thread | multiprocessing.Process
 ):
+    # daemon=None means daemon, except process with process slots (daemon process can not have children)
+    has_process_slots = (
+            worker.concurrency > 1 and worker.sync_concurrency_mode == BaseWorkerSyncConcurrencyModes.process
+    )
+    if daemon is None:
+        daemon = not (mode == SafeRunInBackgroundModes.process and has_process_slots)
+    if mode == SafeRunInBackgroundModes.process and has_process_slots and daemon:
+        raise ValueError("worker with process slots can not be run in daemon process, use daemon=False")
     if mode == SafeRunInBackgroundModes.async_task:
         res: asyncio.Task = asyncio.create_task(worker.async_safe_run())
     elif mode == SafeRunInBackgroundModes.thread:
         res: threading.Thread = threading.Thread(
             target=worker.sync_safe_run,
-            daemon=True
+            daemon=daemon
         )
         res.start()
     elif mode == SafeRunInBackgroundModes.process:
-        res: multiprocessing.Process = multiprocessing.Process(
-            target=worker.sync_safe_run,
-            daemon=True
+        worker._use_multiprocessing_stop_event()
+        res: multiprocessing.Process = multiprocessing.get_context("fork").Process(
+            target=_sync_safe_run_worker_in_process,
+            kwargs={"worker": worker},
+            daemon=daemon
         )
         res.start()
     else:
@@ -172,14 +561,278 @@ def safe_run_worker_in_background(*, worker: BaseWorker, mode: str) -> (
 
 
 def safe_run_workers_in_background(
-        *, workers: list[BaseWorker], mode: str
+        *, workers: list[BaseWorker], mode: str, daemon: bool | None = None
 ) -> list[asyncio.Task] | list[threading.Thread] | list[multiprocessing.Process]:
     res = []
     for worker in workers:
-        res.append(safe_run_worker_in_background(worker=worker, mode=mode))
+        res.append(safe_run_worker_in_background(worker=worker, mode=mode, daemon=daemon))
     return res
 
 
+class WorkerSupervisorStatuses(Enumeration):
+    not_started = "not_started"
+    running = "running"
+    waiting_restart = "waiting_restart"
+    failed = "failed"
+    stopping = "stopping"
+    stopped = "stopped"
+
+
+class _SupervisedWorker:
+
+    def __init__(self, *, worker: BaseWorker, restart_delay: timedelta):
+        self.worker = worker
+        self.handle: asyncio.Task | threading.Thread | multiprocessing.Process | None = None
+        self.status = WorkerSupervisorStatuses.not_started
+        self.restarts_count = 0
+        self.restart_delay = restart_delay
+        self.restart_at: float | None = None
+        self.started_at: float | None = None
+        self.last_start_dt: datetime | None = None
+        self.last_exit_dt: datetime | None = None
+        self.last_exitcode: int | None = None
+        self.last_exception: str | None = None
+
+
+class WorkerSupervisor:
+
+    def __init__(
+            self,
+            *,
+            workers: list[BaseWorker],
+            mode: str = SafeRunInBackgroundModes.process,
+            restart: bool = True,
+            max_restarts: int | None = None,
+            restart_min_delay: timedelta = timedelta(seconds=1),
+            restart_max_delay: timedelta = timedelta(seconds=60),
+            restart_backoff_factor: float = 2.0,
+            check_interval: timedelta = timedelta(seconds=1),
+            stop_timeout: timedelta = timedelta(seconds=30),
+            handle_signals: bool = True
+    ):
+        # restarts dead workers with backoff, delay is reset when worker lived longer than restart_max_delay,
+        # on stop workers get cooperative stop, processes still alive after stop_timeout are killed
+        SafeRunInBackgroundModes.parse_and_validate_values(mode)
+        self.mode = mode
+        self.restart = restart
+        self.max_restarts = max_restarts
+        self.restart_min_delay = restart_min_delay
+        self.restart_max_delay = restart_max_delay
+        self.restart_backoff_factor = restart_backoff_factor
+        self.check_interval = check_interval
+        self.stop_timeout = stop_timeout
+        self.handle_signals = handle_signals
+        self._supervised_workers = [
+            _SupervisedWorker(worker=worker, restart_delay=restart_min_delay) for worker in workers
+        ]
+        self._stop_requested = threading.Event()
+        self._async_stop_requested: asyncio.Event | None = None
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def _start_worker(self, supervised_worker: _SupervisedWorker):
+        supervised_worker.handle = safe_run_worker_in_background(
+            worker=supervised_worker.worker,
+            mode=self.mode,
+            daemon=self.mode != SafeRunInBackgroundModes.process
+        )
+        supervised_worker.status = WorkerSupervisorStatuses.running
+        supervised_worker.started_at = time.monotonic()
+        supervised_worker.last_start_dt = now_utc_dt()
+        supervised_worker.restart_at = None
+
+    @staticmethod
+    def _is_alive(supervised_worker: _SupervisedWorker) -> bool:
+        handle = supervised_worker.handle
+        if handle is None:
+            return False
+        if isinstance(handle, asyncio.Task):
+            return not handle.done()
+        return handle.is_alive()
+
+    @staticmethod
+    def _remember_exit(supervised_worker: _SupervisedWorker):
+        handle = supervised_worker.handle
+        supervised_worker.last_exit_dt = now_utc_dt()
+        supervised_worker.last_exitcode = None
+        supervised_worker.last_exception = None
+        if isinstance(handle, multiprocessing.process.BaseProcess):
+            supervised_worker.last_exitcode = handle.exitcode
+        elif isinstance(handle, asyncio.Task) and not handle.cancelled() and handle.exception() is not None:
+            supervised_worker.last_exception = repr(handle.exception())
+
+    def start(self):
+        for supervised_worker in self._supervised_workers:
+            self._start_worker(supervised_worker)
+
+    def request_stop(self):
+        # can be called from signal handler or other thread
+        self._stop_requested.set()
+        if self._async_stop_requested is not None:
+            self._async_stop_requested.set()
+
+    @property
+    def is_stop_requested(self) -> bool:
+        return self._stop_requested.is_set()
+
+    def check(self):
+        # one supervision pass, detects dead workers and restarts them when their delay passed
+        now = time.monotonic()
+        for supervised_worker in self._supervised_workers:
+            if supervised_worker.status == WorkerSupervisorStatuses.running and not self._is_alive(supervised_worker):
+                self._remember_exit(supervised_worker)
+                self._logger.warning(
+                    f"worker {supervised_worker.worker.worker_fullname} is dead, "
+                    f"exitcode={supervised_worker.last_exitcode}, exception={supervised_worker.last_exception}"
+                )
+                if not self.restart or (
+                        self.max_restarts is not None and supervised_worker.restarts_count >= self.max_restarts
+                ):
+                    supervised_worker.status = WorkerSupervisorStatuses.failed
+                    continue
+                if now - supervised_worker.started_at > self.restart_max_delay.total_seconds():
+                    supervised_worker.restart_delay = self.restart_min_delay
+                supervised_worker.status = WorkerSupervisorStatuses.waiting_restart
+                supervised_worker.restart_at = now + supervised_worker.restart_delay.total_seconds()
+                supervised_worker.restart_delay = min(
+                    supervised_worker.restart_delay * self.restart_backoff_factor, self.restart_max_delay
+                )
+            if (
+                    supervised_worker.status == WorkerSupervisorStatuses.waiting_restart
+                    and now >= supervised_worker.restart_at
+            ):
+                supervised_worker.restarts_count += 1
+                self._logger.info(
+                    f"restart worker {supervised_worker.worker.worker_fullname}, "
+                    f"restarts_count={supervised_worker.restarts_count}"
+                )
+                self._start_worker(supervised_worker)
+
+    def stop(self, timeout: timedelta | None = None):
+        # for thread and process modes
+        timeout = timeout if timeout is not None else self.stop_timeout
+        self._stop_requested.set()
+        for supervised_worker in self._supervised_workers:
+            supervised_worker.worker.stop()
+            if self._is_alive(supervised_worker):
+                supervised_worker.status = WorkerSupervisorStatuses.stopping
+        self.join(timeout=timeout)
+        for supervised_worker in self._supervised_workers:
+            handle = supervised_worker.handle
+            if isinstance(handle, multiprocessing.process.BaseProcess) and handle.is_alive():
+                self._logger.warning(f"kill worker {supervised_worker.worker.worker_fullname} after stop timeout")
+                handle.kill()
+                handle.join()
+            if self._is_alive(supervised_worker):
+                self._logger.warning(f"worker {supervised_worker.worker.worker_fullname} is still alive after stop")
+                continue
+            if supervised_worker.status != WorkerSupervisorStatuses.not_started:
+                if supervised_worker.status in (WorkerSupervisorStatuses.running, WorkerSupervisorStatuses.stopping):
+                    self._remember_exit(supervised_worker)
+                supervised_worker.status = WorkerSupervisorStatuses.stopped
+
+    def join(self, timeout: timedelta | None = None) -> bool:
+        # returns True if all workers finished
+        deadline = time.monotonic() + timeout.total_seconds() if timeout is not None else None
+        for supervised_worker in self._supervised_workers:
+            handle = supervised_worker.handle
+            if handle is None or isinstance(handle, asyncio.Task):
+                continue
+            handle.join(max(deadline - time.monotonic(), 0) if deadline is not None else None)
+        return not any(self._is_alive(supervised_worker) for supervised_worker in self._supervised_workers)
+
+    def run_forever(self):
+        # for thread and process modes, blocks until SIGTERM/SIGINT or request_stop
+        if self.mode == SafeRunInBackgroundModes.async_task:
+            raise ValueError("use async_run_forever for async_task mode")
+        old_handlers = {}
+        if self.handle_signals and threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                old_handlers[signum] = signal.signal(signum, lambda *args: self.request_stop())
+        try:
+            self.start()
+            while not self._stop_requested.wait(self.check_interval.total_seconds()):
+                self.check()
+        finally:
+            self.stop()
+            for signum, old_handler in old_handlers.items():
+                signal.signal(signum, old_handler)
+
+    async def async_stop(self, timeout: timedelta | None = None):
+        # for async_task mode, tasks are cancelled after timeout
+        timeout = timeout if timeout is not None else self.stop_timeout
+        self.request_stop()
+        tasks = []
+        for supervised_worker in self._supervised_workers:
+            supervised_worker.worker.stop()
+            if self._is_alive(supervised_worker):
+                supervised_worker.status = WorkerSupervisorStatuses.stopping
+                tasks.append(supervised_worker.handle)
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout.total_seconds())
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for supervised_worker in self._supervised_workers:
+            if supervised_worker.status == WorkerSupervisorStatuses.not_started:
+                continue
+            if supervised_worker.status in (WorkerSupervisorStatuses.running, WorkerSupervisorStatuses.stopping):
+                self._remember_exit(supervised_worker)
+            supervised_worker.status = WorkerSupervisorStatuses.stopped
+
+    async def async_run_forever(self):
+        # for async_task mode, blocks until SIGTERM/SIGINT or request_stop
+        if self.mode != SafeRunInBackgroundModes.async_task:
+            raise ValueError("async_run_forever is only for async_task mode")
+        loop = asyncio.get_running_loop()
+        self._async_stop_requested = asyncio.Event()
+        if self._stop_requested.is_set():
+            self._async_stop_requested.set()
+        added_signals = []
+        if self.handle_signals and threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                try:
+                    loop.add_signal_handler(signum, self.request_stop)
+                    added_signals.append(signum)
+                except (NotImplementedError, RuntimeError):
+                    pass
+        try:
+            self.start()
+            while not self._stop_requested.is_set():
+                try:
+                    await asyncio.wait_for(
+                        self._async_stop_requested.wait(), timeout=self.check_interval.total_seconds()
+                    )
+                except asyncio.TimeoutError:
+                    self.check()
+        finally:
+            await self.async_stop()
+            for signum in added_signals:
+                loop.remove_signal_handler(signum)
+
+    def get_statuses(self) -> list[dict[str, Any]]:
+        res = []
+        for supervised_worker in self._supervised_workers:
+            handle = supervised_worker.handle
+            res.append({
+                "worker_fullname": supervised_worker.worker.worker_fullname,
+                "mode": self.mode,
+                "status": supervised_worker.status,
+                "is_alive": self._is_alive(supervised_worker),
+                "pid": handle.pid if isinstance(handle, multiprocessing.process.BaseProcess) else None,
+                "restarts_count": supervised_worker.restarts_count,
+                "last_start_dt": supervised_worker.last_start_dt,
+                "last_exit_dt": supervised_worker.last_exit_dt,
+                "last_exitcode": supervised_worker.last_exitcode,
+                "last_exception": supervised_worker.last_exception,
+                # metrics of process worker are in child process, use metrics_exporters for them
+                "metrics": (
+                    supervised_worker.worker.get_metrics_snapshot()
+                    if self.mode != SafeRunInBackgroundModes.process else None
+                )
+            })
+        return res
+
+
 async def a():
     pass
 
@@ -1,12 +1,26 @@
 # arpakit
 
+import asyncio
+import atexit
+import functools
+import inspect
+import json
 import logging
-from datetime import datetime
-from typing import Optional, Any
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Any, Callable
 
 import pytz
-from arpakitlib.ar_json_db_util import JSONDbFile
+from arpakitlib.ar_datetime_util import now_utc_dt
+from arpakitlib.ar_enumeration_util import Enumeration
+from arpakitlib.ar_func_util import is_coroutine, is_async_func
+from arpakitlib.ar_hash_util import hash_string
+from arpakitlib.ar_json_db_util import JSONDbFile, JSONDbFileSerializers, AsyncCoalescingExecutor
 from arpakitlib.ar_type_util import raise_for_type
+from cachetools import LRUCache, TTLCache
 from pydantic import BaseModel
 
 
@@ -14,15 +28,119 @@ class CacheBlock(BaseModel):
     key: str
     data: Any
     last_update_dt: datetime
+    expire_dt: Optional[datetime] = None
+
+    @property
+    def is_expired(self) -> bool:
+        return self.expire_dt is not None and self.expire_dt <= datetime.now(tz=pytz.UTC)
+
+
+class CacheFileEvictionPolicies(Enumeration):
+    lru = "lru"
+    lfu = "lfu"
+
+
+class CacheFileWriteModes(Enumeration):
+    write_through = "write_through"
+    write_back = "write_back"
 
 
 class CacheFile:
 
-    def __init__(self, *, json_db_file: JSONDbFile):
+    def __init__(
+            self,
+            *,
+            json_db_file: JSONDbFile | None = None,
+            filepath: str | None = None,
+            serializer: str = JSONDbFileSerializers.json,
+            ttl: timedelta | None = None,
+            max_blocks: int | None = None,
+            max_bytes: int | None = None,
+            eviction_policy: str = CacheFileEvictionPolicies.lru,
+            memory_max_blocks: int | None = None,
+            memory_ttl: timedelta | None = None,
+            write_mode: str = CacheFileWriteModes.write_through,
+            write_back_max_dirty_blocks: int = 1000,
+            write_back_flush_interval: timedelta | None = timedelta(seconds=5),
+            **kwargs
+    ):
+        # json_db_file or filepath, kwargs are passed to JSONDbFile
+        if json_db_file is None:
+            if filepath is None:
+                raise ValueError("json_db_file is None and filepath is None")
+            json_db_file = JSONDbFile(filepath=filepath, serializer=serializer, **kwargs)
         self.json_db_file = json_db_file
         self._logger = logging.getLogger(self.__class__.__name__)
 
+        if ttl is not None:
+            raise_for_type(ttl, timedelta)
+        if max_blocks is not None:
+            raise_for_type(max_blocks, int)
+            if max_blocks < 1:
+                raise ValueError("max_blocks < 1")
+        if max_bytes is not None:
+            raise_for_type(max_bytes, int)
+            if max_bytes < 1:
+                raise ValueError("max_bytes < 1")
+        CacheFileEvictionPolicies.parse_and_validate_values(eviction_policy)
+        if memory_max_blocks is not None:
+            raise_for_type(memory_max_blocks, int)
+            if memory_max_blocks < 1:
+                raise ValueError("memory_max_blocks < 1")
+        if memory_ttl is not None:
+            raise_for_type(memory_ttl, timedelta)
+        CacheFileWriteModes.parse_and_validate_values(write_mode)
+        raise_for_type(write_back_max_dirty_blocks, int)
+        if write_back_flush_interval is not None:
+            raise_for_type(write_back_flush_interval, timedelta)
+
+        self.ttl = ttl
+        self.max_blocks = max_blocks
+        self.max_bytes = max_bytes
+        self.eviction_policy = eviction_policy
+
+        # access stats are kept only in memory, so reads do not write to file,
+        # they are initialized from last_update_dt of blocks in file
+        self._block_key_to_access_count: OrderedDict[str, int] | None = None
+        self._block_key_to_size: dict[str, int] = {}
+        self._blocks_size: int = 0
+
+        # in-process tier in front of the file: ready CacheBlock objects, no file io and no validation on hit,
+        # write_back: writes stay in _dirty_blocks until flush(), close(), exit of with, process exit (atexit),
+        # write_back_max_dirty_blocks or write after write_back_flush_interval,
+        # dirty blocks are lost if process crashes or is killed
+        self.memory_max_blocks = memory_max_blocks
+        self.memory_ttl = memory_ttl
+        self.write_mode = write_mode
+        self.write_back_max_dirty_blocks = write_back_max_dirty_blocks
+        self.write_back_flush_interval = write_back_flush_interval
+        self._flushed_at = time.monotonic()
+        self._memory_cache: LRUCache | TTLCache | None = None
+        if memory_max_blocks is not None:
+            if memory_ttl is not None:
+                self._memory_cache = TTLCache(maxsize=memory_max_blocks, ttl=memory_ttl.total_seconds())
+            else:
+                self._memory_cache = LRUCache(maxsize=memory_max_blocks)
+        self._dirty_blocks: dict[str, CacheBlock] = {}
+        self.memory_hits: int = 0
+        self.memory_misses: int = 0
+        self.file_hits: int = 0
+        self.file_misses: int = 0
+
+        if self.is_write_back:
+            atexit.register(_flush_cache_file_at_exit, weakref.ref(self))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.flush()
+
     def __len__(self) -> int:
+        self.flush()
         return self.json_db_file.count_records()
 
     def __str__(self) -> str:
@@ -31,12 +149,215 @@ class CacheFile:
     def __repr__(self) -> str:
         return f"CacheFile ({self.json_db_file.filepath}) ({self.json_db_file.count_records()})"
 
+    @property
+    def has_limits(self) -> bool:
+        return self.max_blocks is not None or self.max_bytes is not None
+
+    @staticmethod
+    def _record_to_block(*, key: str, record: dict[str, Any]) -> CacheBlock:
+        return CacheBlock(
+            key=key,
+            data=record["data"],
+            last_update_dt=datetime.fromisoformat(record["last_update_dt"]),
+            expire_dt=(
+                datetime.fromisoformat(record["expire_dt"])
+                if record.get("expire_dt") is not None
+                else None
+            )
+        )
+
+    @staticmethod
+    def _block_to_record(block: CacheBlock) -> dict[str, Any]:
+        return {
+            "data": block.data,
+            "last_update_dt": block.last_update_dt.isoformat(),
+            "expire_dt": block.expire_dt.isoformat() if block.expire_dt is not None else None
+        }
+
+    @property
+    def is_write_back(self) -> bool:
+        return self.write_mode == CacheFileWriteModes.write_back and self._memory_cache is not None
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "memory_hits": self.memory_hits,
+            "memory_misses": self.memory_misses,
+            "file_hits": self.file_hits,
+            "file_misses": self.file_misses,
+            "memory_blocks": len(self._memory_cache) if self._memory_cache is not None else 0,
+            "dirty_blocks": len(self._dirty_blocks)
+        }
+
+    def _get_block_from_memory(self, key: str) -> Optional[CacheBlock]:
+        if self._memory_cache is None:
+            return None
+        block = self._dirty_blocks.get(key)
+        if block is None:
+            block = self._memory_cache.get(key)
+        if block is None:
+            self.memory_misses += 1
+            return None
+        self.memory_hits += 1
+        return block
+
+    def _put_block_in_memory(self, block: CacheBlock):
+        if self._memory_cache is not None:
+            self._memory_cache[block.key] = block
+
+    def _forget_block_in_memory(self, key: str):
+        if self._memory_cache is not None:
+            self._memory_cache.pop(key, None)
+        self._dirty_blocks.pop(key, None)
+
+    def _write_block(self, *, block: CacheBlock, must_exist: bool | None):
+        # must_exist: True - update, False - create, None - create or update
+        if self.is_write_back:
+            if must_exist is not None:
+                exists = block.key in self._dirty_blocks or self.json_db_file.check_record_id_exists(block.key)
+                if must_exist is False and exists:
+                    raise KeyError(f"record with record_id={block.key} already exists")
+                if must_exist is True and not exists:
+                    raise ValueError(f"block (key='{block.key}') not exists")
+            self._dirty_blocks[block.key] = block
+            self._put_block_in_memory(block)
+            is_flush_interval_passed = (
+                    self.write_back_flush_interval is not None
+                    and time.monotonic() - self._flushed_at >= self.write_back_flush_interval.total_seconds()
+            )
+            if len(self._dirty_blocks) > self.write_back_max_dirty_blocks or is_flush_interval_passed:
+                self.flush()
+            return
+
+        self._write_records_to_file(
+            key_to_record={block.key: self._block_to_record(block)},
+            must_exist=must_exist,
+            protected_keys={block.key}
+        )
+        self._put_block_in_memory(block)
+
+    def _write_records_to_file(
+            self,
+            *,
+            key_to_record: dict[str, dict[str, Any]],
+            must_exist: bool | None,
+            protected_keys: set[str] | None = None
+    ):
+        self._ensure_access_stats()
+        with self.json_db_file.transaction():
+            for key, record in key_to_record.items():
+                if must_exist is None:
+                    must_exist_ = self.json_db_file.check_record_id_exists(record_id=key)
+                else:
+                    must_exist_ = must_exist
+                if must_exist_:
+                    self.json_db_file.update_record(record_id=key, record=record)
+                else:
+                    self.json_db_file.create_record(record_id=key, record=record)
+                self._remember_block_write(key=key, record=record)
+            self._evict_blocks(protected_keys=protected_keys)
+
+    def flush(self):
+        self._flushed_at = time.monotonic()
+        if not self._dirty_blocks:
+            return
+        dirty_blocks = self._dirty_blocks
+        self._dirty_blocks = {}
+        try:
+            self._write_records_to_file(
+                key_to_record={key: self._block_to_record(block) for key, block in dirty_blocks.items()},
+                must_exist=None
+            )
+        except BaseException:
+            dirty_blocks.update(self._dirty_blocks)
+            self._dirty_blocks = dirty_blocks
+            raise
+
+    @staticmethod
+    def _is_record_expired(record: dict[str, Any]) -> bool:
+        if record.get("expire_dt") is None:
+            return False
+        return datetime.fromisoformat(record["expire_dt"]) <= datetime.now(tz=pytz.UTC)
+
+    @staticmethod
+    def _get_record_size(record: dict[str, Any]) -> int:
+        return len(json.dumps(record, ensure_ascii=False, default=str).encode())
+
+    def _make_expire_dt(self, *, last_update_dt: datetime, ttl: timedelta | None) -> Optional[datetime]:
+        if ttl is None:
+            ttl = self.ttl
+        if ttl is None:
+            return None
+        raise_for_type(ttl, timedelta)
+        return last_update_dt + ttl
+
+    def _ensure_access_stats(self):
+        if not self.has_limits or self._block_key_to_access_count is not None:
+            return
+        self._block_key_to_access_count = OrderedDict()
+        self._block_key_to_size = {}
+        self._blocks_size = 0
+        records = sorted(self.json_db_file.get_records(), key=lambda item: item[1]["last_update_dt"])
+        for key, record in records:
+            self._remember_block_write(key=key, record=record)
+
+    def _remember_block_write(self, *, key: str, record: dict[str, Any]):
+        if self._block_key_to_access_count is None:
+            return
+        size = self._get_record_size(record)
+        self._blocks_size += size - self._block_key_to_size.get(key, 0)
+        self._block_key_to_size[key] = size
+        self._block_key_to_access_count[key] = self._block_key_to_access_count.get(key, 0) + 1
+        self._block_key_to_access_count.move_to_end(key)
+
+    def _remember_block_access(self, key: str):
+        if self._block_key_to_access_count is None or key not in self._block_key_to_access_count:
+            return
+        self._block_key_to_access_count[key] += 1
+        self._block_key_to_access_count.move_to_end(key)
+
+    def _forget_block(self, key: str):
+        if self._block_key_to_access_count is None:
+            return
+        self._block_key_to_access_count.pop(key, None)
+        self._blocks_size -= self._block_key_to_size.pop(key, 0)
+
+    def _check_limits_exceeded(self) -> bool:
+        if self.max_blocks is not None and len(self._block_key_to_access_count) > self.max_blocks:
+            return True
+        if self.max_bytes is not None and self._blocks_size > self.max_bytes:
+            return True
+        return False
+
+    def _select_block_key_to_evict(self, *, protected_keys: set[str]) -> Optional[str]:
+        keys = (key for key in self._block_key_to_access_count.keys() if key not in protected_keys)
+        if self.eviction_policy == CacheFileEvictionPolicies.lfu:
+            # ties are resolved by recency, OrderedDict keeps least recently used first
+            return min(keys, key=lambda key: self._block_key_to_access_count[key], default=None)
+        return next(keys, None)
+
+    def _evict_blocks(self, *, protected_keys: set[str] | None = None):
+        if self._block_key_to_access_count is None:
+            return
+        if protected_keys is None:
+            protected_keys = set()
+        keys_to_evict = []
+        while self._check_limits_exceeded():
+            key = self._select_block_key_to_evict(protected_keys=protected_keys)
+            if key is None:
+                break
+            keys_to_evict.append(key)
+            self._forget_block(key)
+            self._forget_block_in_memory(key)
+        if keys_to_evict:
+            self.json_db_file.rm_records(keys_to_evict)
+
     def create_block(
             self,
             *,
             key: str,
             data: Any,
-            last_update_dt: Optional[datetime] = None
+            last_update_dt: Optional[datetime] = None,
+            ttl: timedelta | None = None
     ) -> CacheBlock:
         raise_for_type(key, str)
 
@@ -44,42 +365,46 @@ class CacheFile:
             last_update_dt = datetime.now(tz=pytz.UTC)
         raise_for_type(last_update_dt, datetime)
         last_update_dt = last_update_dt.astimezone(tz=pytz.UTC)
+        expire_dt = self._make_expire_dt(last_update_dt=last_update_dt, ttl=ttl)
 
-        _, record = self.json_db_file.create_record(
-            record_id=key,
-            record={
-                "data": data,
-                "last_update_dt": last_update_dt.isoformat()
-            }
-        )
+        block = CacheBlock.model_construct(key=key, data=data, last_update_dt=last_update_dt, expire_dt=expire_dt)
+        self._write_block(block=block, must_exist=False)
 
-        return CacheBlock(
-            key=key,
-            data=record["data"],
-            last_update_dt=datetime.fromisoformat(record["last_update_dt"])
-        )
+        return block
 
     def get_block(self, key: str) -> Optional[CacheBlock]:
         raise_for_type(key, str)
 
+        block = self._get_block_from_memory(key)
+        if block is not None:
+            if block.expire_dt is not None and block.expire_dt <= now_utc_dt():
+                self.remove_block(key=key)
+                return None
+            self._remember_block_access(key)
+            return block
+
         record = self.json_db_file.get_record(record_id=key)
         if record is None:
+            self.file_misses += 1
             return None
+        self.file_hits += 1
 
-        return CacheBlock(
-            key=key,
-            data=record["data"],
-            last_update_dt=datetime.fromisoformat(record["last_update_dt"])
-        )
+        if self._is_record_expired(record):
+            self.remove_block(key=key)
+            return None
+
+        self._remember_block_access(key)
+
+        block = self._record_to_block(key=key, record=record)
+        self._put_block_in_memory(block)
+        return block
 
     def get_blocks(self) -> list[CacheBlock]:
+        self.flush()
         return [
-            CacheBlock(
-                key=record_id,
-                data=record["data"],
-                last_update_dt=datetime.fromisoformat(record["last_update_dt"])
-            )
+            self._record_to_block(key=record_id, record=record)
             for record_id, record in self.json_db_file.get_records()
+            if not self._is_record_expired(record)
         ]
 
     def update_block(
@@ -87,12 +412,18 @@ class CacheFile:
             *,
             key: str,
             data: Optional[dict[str, Any]] = None,
-            last_update_dt: Optional[datetime] = None
+            last_update_dt: Optional[datetime] = None,
+            ttl: timedelta | None = None
     ) -> CacheBlock:
         raise_for_type(key, str)
-        record = self.json_db_file.get_record(record_id=key)
+        block = self._get_block_from_memory(key)
+        if block is not None:
+            record = self._block_to_record(block)
+        else:
+            record = self.json_db_file.get_record(record_id=key)
         if record is None:
             raise ValueError(f"block (key='{key}') not exists")
+        record = dict(record)
 
         if data is not None:
             raise_for_type(data, dict)
@@ -103,16 +434,309 @@ class CacheFile:
             last_update_dt = last_update_dt.astimezone(tz=pytz.UTC)
             record["last_update_dt"] = last_update_dt.isoformat()
 
-        self.json_db_file.update_record(record_id=key, record=record)
+        if ttl is not None or (self.ttl is not None and (data is not None or last_update_dt is not None)):
+            expire_dt = self._make_expire_dt(
+                last_update_dt=datetime.fromisoformat(record["last_update_dt"]), ttl=ttl
+            )
+            record["expire_dt"] = expire_dt.isoformat()
+
+        block = self._record_to_block(key=key, record=record)
+        self._write_block(block=block, must_exist=True)
+
+        return block
+
+    def set_block(self, *, key: str, data: Any, ttl: timedelta | None = None) -> CacheBlock:
+        raise_for_type(key, str)
+        last_update_dt = datetime.now(tz=pytz.UTC)
+        expire_dt = self._make_expire_dt(last_update_dt=last_update_dt, ttl=ttl)
+
+        block = CacheBlock.model_construct(key=key, data=data, last_update_dt=last_update_dt, expire_dt=expire_dt)
+        self._write_block(block=block, must_exist=None)
 
-        return self.get_block(key=key)
+        return block
+
+    def get_or_compute(self, *, key: str, func: Callable[[], Any], ttl: timedelta | None = None) -> Any:
+        # expired block is a miss
+        block = self.get_block(key=key)
+        if block is not None:
+            return block.data
+        data = func()
+        self.set_block(key=key, data=data, ttl=ttl)
+        return data
 
     def remove_block(self, key: str):
         raise_for_type(key, str)
+        self._forget_block_in_memory(key)
         self.json_db_file.rm_record(record_id=key)
+        self._forget_block(key)
 
     def remove_blocks(self):
+        self._dirty_blocks.clear()
+        if self._memory_cache is not None:
+            self._memory_cache.clear()
         self.json_db_file.rm_all_records()
+        if self._block_key_to_access_count is not None:
+            self._block_key_to_access_count.clear()
+            self._block_key_to_size.clear()
+            self._blocks_size = 0
+
+    def remove_expired_blocks(self) -> list[str]:
+        self.flush()
+        keys = [
+            record_id
+            for record_id, record in self.json_db_file.get_records()
+            if self._is_record_expired(record)
+        ]
+        if keys:
+            self.json_db_file.rm_records(keys)
+            for key in keys:
+                self._forget_block(key)
+                self._forget_block_in_memory(key)
+        return keys
+
+
+def _flush_cache_file_at_exit(cache_file_ref: weakref.ref):
+    cache_file = cache_file_ref()
+    if cache_file is None:
+        return
+    try:
+        cache_file.flush()
+    except Exception as exception:
+        cache_file._logger.error("exception in flush at exit", exc_info=exception)
+
+
+class AsyncCacheFile:
+
+    def __init__(self, *, cache_file: CacheFile | None = None, **kwargs):
+        # cache_file or kwargs for CacheFile
+        if cache_file is None:
+            cache_file = CacheFile(**kwargs)
+        self.cache_file = cache_file
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.executor = AsyncCoalescingExecutor(make_transaction=cache_file.json_db_file.transaction)
+
+    def __str__(self) -> str:
+        return f"AsyncCacheFile ({self.cache_file.json_db_file.filepath})"
+
+    def __repr__(self) -> str:
+        return f"AsyncCacheFile ({self.cache_file.json_db_file.filepath})"
+
+    def _check_block_in_memory(self, key: str) -> bool:
+        return self.cache_file._memory_cache is not None and (
+                key in self.cache_file._dirty_blocks or key in self.cache_file._memory_cache
+        )
+
+    async def get_block(self, key: str) -> Optional[CacheBlock]:
+        # memory tier hit does not need a thread
+        return await self.executor.run_read(
+            lambda: self.cache_file.get_block(key=key),
+            in_thread=not self._check_block_in_memory(key)
+        )
+
+    async def get_blocks(self) -> list[CacheBlock]:
+        return await self.executor.run_read(self.cache_file.get_blocks)
+
+    async def create_block(
+            self,
+            *,
+            key: str,
+            data: Any,
+            last_update_dt: Optional[datetime] = None,
+            ttl: timedelta | None = None
+    ) -> CacheBlock:
+        return await self.executor.run_write(
+            lambda: self.cache_file.create_block(key=key, data=data, last_update_dt=last_update_dt, ttl=ttl)
+        )
+
+    async def update_block(
+            self,
+            *,
+            key: str,
+            data: Optional[dict[str, Any]] = None,
+            last_update_dt: Optional[datetime] = None,
+            ttl: timedelta | None = None
+    ) -> CacheBlock:
+        return await self.executor.run_write(
+            lambda: self.cache_file.update_block(key=key, data=data, last_update_dt=last_update_dt, ttl=ttl)
+        )
+
+    async def set_block(self, *, key: str, data: Any, ttl: timedelta | None = None) -> CacheBlock:
+        return await self.executor.run_write(lambda: self.cache_file.set_block(key=key, data=data, ttl=ttl))
+
+    async def get_or_compute(self, *, key: str, func: Callable[[], Any], ttl: timedelta | None = None) -> Any:
+        # func can be sync or async
+        block = await self.get_block(key=key)
+        if block is not None:
+            return block.data
+        data = func()
+        if is_coroutine(data):
+            data = await data
+        await self.set_block(key=key, data=data, ttl=ttl)
+        return data
+
+    async def remove_block(self, key: str):
+        await self.executor.run_write(lambda: self.cache_file.remove_block(key=key))
+
+    async def remove_blocks(self):
+        await self.executor.run_write(self.cache_file.remove_blocks)
+
+    async def remove_expired_blocks(self) -> list[str]:
+        return await self.executor.run_write(self.cache_file.remove_expired_blocks)
+
+    async def flush(self):
+        await self.executor.run_read(self.cache_file.flush)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        await self.executor.wait_pending_writes()
+        await self.flush()
+
+
+def make_cache_key_for_func_call(*, func: Callable, args: tuple, kwargs: dict[str, Any]) -> str:
+    # repr of objects (e.g. <Svc object at 0x...>) differs between instances and processes, so it is not used
+    try:
+        args_str = json.dumps([list(args), kwargs], ensure_ascii=False, sort_keys=True)
+    except TypeError as exception:
+        raise TypeError(
+            f"args of {func.__qualname__} are not json serializable, pass key= to cached, exception={exception}"
+        ) from exception
+    return f"{func.__module__}.{func.__qualname__}:{hash_string(args_str)}"
+
+
+class _SingleFlightCall:
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.exception: BaseException | None = None
+
+
+_single_flight_leader_cancelled = object()
+
+
+def cached(
+        cache_file: CacheFile | AsyncCacheFile,
+        *,
+        ttl: timedelta | None = None,
+        key: Callable[..., str] | None = None
+):
+    """
+    Memoization of sync/async func in cache_file, concurrent misses of the same key are computed once.
+    key(*args, **kwargs) -> str, by default hash of json serializable args (TypeError for other args).
+    First arg named self or cls is not a part of default key, so all instances share cached results,
+    pass key= if result depends on instance.
+    """
+
+    def _make_key(func: Callable, args: tuple, kwargs: dict[str, Any], *, skip_first_arg: bool) -> str:
+        if key is not None:
+            return key(*args, **kwargs)
+        if skip_first_arg:
+            args = args[1:]
+        return make_cache_key_for_func_call(func=func, args=args, kwargs=kwargs)
+
+    def _decorator(func: Callable):
+        parameters = list(inspect.signature(func).parameters)
+        skip_first_arg = bool(parameters) and parameters[0] in ("self", "cls")
+
+        if is_async_func(func):
+            key_to_future: dict[str, asyncio.Future] = {}
+
+            async def _get_block(cache_key: str) -> Optional[CacheBlock]:
+                if isinstance(cache_file, AsyncCacheFile):
+                    return await cache_file.get_block(key=cache_key)
+                return cache_file.get_block(key=cache_key)
+
+            async def _set_block(cache_key: str, data: Any):
+                if isinstance(cache_file, AsyncCacheFile):
+                    await cache_file.set_block(key=cache_key, data=data, ttl=ttl)
+                else:
+                    cache_file.set_block(key=cache_key, data=data, ttl=ttl)
+
+            @functools.wraps(func)
+            async def _async_wrapper(*args, **kwargs):
+                cache_key = _make_key(func, args, kwargs, skip_first_arg=skip_first_arg)
+
+                while True:
+                    block = await _get_block(cache_key)
+                    if block is not None:
+                        return block.data
+
+                    if cache_key in key_to_future:
+                        res = await asyncio.shield(key_to_future[cache_key])
+                        if res is _single_flight_leader_cancelled:
+                            # leader was cancelled, one of waiters becomes new leader
+                            continue
+                        return res
+
+                    future = asyncio.get_running_loop().create_future()
+                    key_to_future[cache_key] = future
+                    try:
+                        res = await func(*args, **kwargs)
+                        await _set_block(cache_key, res)
+                    except asyncio.CancelledError:
+                        # cancellation of leader is not an error of waiters
+                        future.set_result(_single_flight_leader_cancelled)
+                        raise
+                    except BaseException as exception:
+                        future.set_exception(exception)
+                        # mark as retrieved, there can be no waiters
+                        future.exception()
+                        raise
+                    else:
+                        future.set_result(res)
+                        return res
+                    finally:
+                        key_to_future.pop(cache_key, None)
+
+            return _async_wrapper
+
+        if isinstance(cache_file, AsyncCacheFile):
+            raise TypeError("sync func can not be cached in AsyncCacheFile, use CacheFile")
+
+        key_to_call: dict[str, _SingleFlightCall] = {}
+        key_to_call_lock = threading.Lock()
+
+        @functools.wraps(func)
+        def _sync_wrapper(*args, **kwargs):
+            cache_key = _make_key(func, args, kwargs, skip_first_arg=skip_first_arg)
+
+            block = cache_file.get_block(key=cache_key)
+            if block is not None:
+                return block.data
+
+            with key_to_call_lock:
+                call = key_to_call.get(cache_key)
+                is_leader = call is None
+                if is_leader:
+                    call = _SingleFlightCall()
+                    key_to_call[cache_key] = call
+
+            if not is_leader:
+                call.event.wait()
+                if call.exception is not None:
+                    raise call.exception
+                return call.result
+
+            try:
+                call.result = func(*args, **kwargs)
+                cache_file.set_block(key=cache_key, data=call.result, ttl=ttl)
+                return call.result
+            except BaseException as exception:
+                call.exception = exception
+                raise
+            finally:
+                with key_to_call_lock:
+                    key_to_call.pop(cache_key, None)
+                call.event.set()
+
+        return _sync_wrapper
+
+    return _decorator
 
 
 def __example():
@@ -0,0 +1,256 @@
+# arpakit
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from datetime import timedelta, datetime
+from typing import Any, Callable
+
+from arpakitlib.ar_datetime_util import now_utc_dt
+from arpakitlib.ar_enumeration_util import Enumeration
+from arpakitlib.ar_type_util import raise_for_type
+
+
+class CircuitBreakerStates(Enumeration):
+    closed = "closed"
+    open = "open"
+    half_open = "half_open"
+
+
+class CircuitBreakerOpenError(Exception):
+
+    def __init__(self, *, name: str, retry_after: timedelta):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"circuit breaker {name} is open, retry_after={retry_after}")
+
+
+class CircuitBreaker:
+
+    def __init__(
+            self,
+            *,
+            name: str,
+            failure_rate_threshold: float = 0.5,
+            min_calls: int = 10,
+            window: timedelta = timedelta(seconds=60),
+            open_timeout: timedelta = timedelta(seconds=30),
+            half_open_max_calls: int = 1,
+            is_failure: Callable[[BaseException], bool] | None = None
+    ):
+        raise_for_type(window, timedelta)
+        raise_for_type(open_timeout, timedelta)
+        if not 0 < failure_rate_threshold <= 1:
+            raise ValueError("failure_rate_threshold must be in (0, 1]")
+        if min_calls < 1:
+            raise ValueError("min_calls < 1")
+        if half_open_max_calls < 1:
+            raise ValueError("half_open_max_calls < 1")
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.window = window
+        self.open_timeout = open_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.is_failure = is_failure
+
+        self._lock = threading.Lock()
+        self._state = CircuitBreakerStates.closed
+        self._calls: deque[tuple[float, bool]] = deque()  # (monotonic, is_failure) for calls in window
+        self._opened_at: float | None = None
+        self._half_open_calls = 0
+        self._half_open_successes = 0
+
+        self._total_successes = 0
+        self._total_failures = 0
+        self._total_rejected = 0
+        self._opened_count = 0
+        self._last_state_change_dt: datetime = now_utc_dt()
+        self._logger = logging.getLogger(f"{self.__class__.__name__}[{name}]")
+
+    def _set_state(self, state: str):
+        if self._state == state:
+            return
+        self._logger.info(f"{self._state} -> {state}")
+        self._state = state
+        self._last_state_change_dt = now_utc_dt()
+        if state == CircuitBreakerStates.open:
+            self._opened_at = time.monotonic()
+            self._opened_count += 1
+        if state == CircuitBreakerStates.half_open:
+            self._half_open_calls = 0
+            self._half_open_successes = 0
+        if state == CircuitBreakerStates.closed:
+            self._calls.clear()
+            self._opened_at = None
+
+    def _remove_old_calls(self, now: float):
+        border = now - self.window.total_seconds()
+        while self._calls and self._calls[0][0] < border:
+            self._calls.popleft()
+
+    def _get_retry_after(self, now: float) -> timedelta:
+        if self._opened_at is None:
+            return timedelta(seconds=0)
+        return timedelta(seconds=max(self._opened_at + self.open_timeout.total_seconds() - now, 0.0))
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if (
+                    self._state == CircuitBreakerStates.open
+                    and self._get_retry_after(time.monotonic()) == timedelta(seconds=0)
+            ):
+                return CircuitBreakerStates.half_open
+            return self._state
+
+    def before_call(self):
+        # raises CircuitBreakerOpenError if call is not allowed,
+        # every allowed call must be finished with on_success, on_failure or on_ignore
+        with self._lock:
+            now = time.monotonic()
+            if self._state == CircuitBreakerStates.open:
+                retry_after = self._get_retry_after(now)
+                if retry_after > timedelta(seconds=0):
+                    self._total_rejected += 1
+                    raise CircuitBreakerOpenError(name=self.name, retry_after=retry_after)
+                self._set_state(CircuitBreakerStates.half_open)
+            if self._state == CircuitBreakerStates.half_open:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    self._total_rejected += 1
+                    raise CircuitBreakerOpenError(name=self.name, retry_after=timedelta(seconds=0))
+                self._half_open_calls += 1
+
+    def on_success(self):
+        with self._lock:
+            self._total_successes += 1
+            now = time.monotonic()
+            if self._state == CircuitBreakerStates.half_open:
+                self._half_open_successes += 1
+                if self._half_open_successes >= self.half_open_max_calls:
+                    self._set_state(CircuitBreakerStates.closed)
+                return
+            if self._state == CircuitBreakerStates.closed:
+                self._calls.append((now, False))
+                self._remove_old_calls(now)
+
+    def on_failure(self, exception: BaseException | None = None):
+        if exception is not None and self.is_failure is not None and not self.is_failure(exception):
+            self.on_success()
+            return
+        with self._lock:
+            self._total_failures += 1
+            now = time.monotonic()
+            if self._state == CircuitBreakerStates.half_open:
+                self._set_state(CircuitBreakerStates.open)
+                return
+            if self._state == CircuitBreakerStates.closed:
+                self._calls.append((now, True))
+                self._remove_old_calls(now)
+                if len(self._calls) >= self.min_calls:
+                    failures = sum(1 for _, is_failure in self._calls if is_failure)
+                    if failures / len(self._calls) >= self.failure_rate_threshold:
+                        self._set_state(CircuitBreakerStates.open)
+
+    def on_ignore(self):
+        # finishes allowed call without result (e.g. cancelled), frees half_open slot
+        with self._lock:
+            if self._state == CircuitBreakerStates.half_open and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def reset(self):
+        with self._lock:
+            self._set_state(CircuitBreakerStates.closed)
+
+    def sync_call(self, func: Callable, *args, **kwargs) -> Any:
+        self.before_call()
+        try:
+            res = func(*args, **kwargs)
+        except Exception as exception:
+            self.on_failure(exception)
+            raise
+        except BaseException:
+            self.on_ignore()
+            raise
+        self.on_success()
+        return res
+
+    async def async_call(self, async_func: Callable, *args, **kwargs) -> Any:
+        self.before_call()
+        try:
+            res = await async_func(*args, **kwargs)
+        except Exception as exception:
+            self.on_failure(exception)
+            raise
+        except BaseException:
+            self.on_ignore()
+            raise
+        self.on_success()
+        return res
+
+    def get_metrics(self) -> dict[str, Any]:
+        state = self.state
+        with self._lock:
+            self._remove_old_calls(time.monotonic())
+            window_calls = len(self._calls)
+            window_failures = sum(1 for _, is_failure in self._calls if is_failure)
+            return {
+                "name": self.name,
+                "state": state,
+                "window_calls": window_calls,
+                "window_failures": window_failures,
+                "window_failure_rate": (window_failures / window_calls) if window_calls else 0.0,
+                "total_successes": self._total_successes,
+                "total_failures": self._total_failures,
+                "total_rejected": self._total_rejected,
+                "opened_count": self._opened_count,
+                "retry_after_seconds": self._get_retry_after(time.monotonic()).total_seconds(),
+                "last_state_change_dt": self._last_state_change_dt
+            }
+
+
+class CircuitBreakerRegistry:
+
+    def __init__(self, **circuit_breaker_kwargs):
+        # one CircuitBreaker per name (e.g. host), all created with same kwargs
+        self.circuit_breaker_kwargs = circuit_breaker_kwargs
+        self._name_to_circuit_breaker: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            circuit_breaker = self._name_to_circuit_breaker.get(name)
+            if circuit_breaker is None:
+                circuit_breaker = CircuitBreaker(name=name, **self.circuit_breaker_kwargs)
+                self._name_to_circuit_breaker[name] = circuit_breaker
+            return circuit_breaker
+
+    def get_names(self) -> list[str]:
+        with self._lock:
+            return list(self._name_to_circuit_breaker.keys())
+
+    def get_metrics(self) -> list[dict[str, Any]]:
+        with self._lock:
+            circuit_breakers = list(self._name_to_circuit_breaker.values())
+        return [circuit_breaker.get_metrics() for circuit_breaker in circuit_breakers]
+
+    def reset(self):
+        with self._lock:
+            circuit_breakers = list(self._name_to_circuit_breaker.values())
+        for circuit_breaker in circuit_breakers:
+            circuit_breaker.reset()
+
+
+def __example():
+    pass
+
+
+async def __async_example():
+    pass
+
+
+if __name__ == '__main__':
+    __example()
+    asyncio.run(__async_example())
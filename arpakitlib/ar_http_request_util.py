@@ -1,20 +1,202 @@
 # arpakit
 
 import asyncio
+import hashlib
 import logging
+import os
+import threading
+import uuid
+from contextlib import asynccontextmanager, contextmanager, ExitStack, AsyncExitStack
 from datetime import timedelta
-from typing import Any
+from typing import Any, AsyncIterator, Iterator, Callable
 
 import aiohttp
 import requests
 from aiohttp_socks import ProxyConnector
+from requests.adapters import HTTPAdapter
+from pydantic import BaseModel, ConfigDict
+from urllib3 import Retry
+from arpakitlib.ar_file_storage_in_dir_util import FileStorageInDir
 from arpakitlib.ar_json_util import transfer_data_to_json_str
+from arpakitlib.ar_rate_limiter_util import RequestLimiter, RateLimiterTimeoutError
+from arpakitlib.ar_retry_func_util import RetryPolicy, RetryState, parse_retry_after
 from arpakitlib.ar_sleep_util import sync_safe_sleep, async_safe_sleep
 from arpakitlib.ar_type_util import raise_for_type
 
 _logger = logging.getLogger(__name__)
 
 
+class SyncHTTPSessionPool:
+
+    def __init__(
+            self,
+            *,
+            pool_connections: int = 10,
+            pool_maxsize: int = 10,
+            pool_block: bool = False,
+            max_retries: int | Retry | None = None
+    ):
+        # requests.Session is not guaranteed thread-safe, so every thread gets its own session,
+        # keep-alive connections are reused between requests of the same thread
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.max_retries = max_retries
+        self._thread_local = threading.local()
+        self._sessions: list[requests.Session] = []
+        self._sessions_lock = threading.Lock()
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def __enter__(self):
+        self.startup()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def startup(self):
+        self.get_session()
+
+    def shutdown(self):
+        with self._sessions_lock:
+            sessions = self._sessions
+            self._sessions = []
+        for session in sessions:
+            session.close()
+        self._thread_local = threading.local()
+
+    def _make_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=self.max_retries if self.max_retries is not None else 0
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def get_session(self) -> requests.Session:
+        session: requests.Session | None = getattr(self._thread_local, "session", None)
+        if session is None:
+            session = self._make_session()
+            self._thread_local.session = session
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def get_sessions_count(self) -> int:
+        with self._sessions_lock:
+            return len(self._sessions)
+
+
+class AsyncHTTPSessionPool:
+
+    def __init__(
+            self,
+            *,
+            limit: int = 100,
+            limit_per_host: int = 0,
+            use_dns_cache: bool = True,
+            ttl_dns_cache: int | None = 300,
+            keepalive_timeout: float = 30,
+            **connector_kwargs
+    ):
+        # one ClientSession (and connector) per proxy_url, keep-alive connections are reused between requests,
+        # sessions are bound to event loop, so use one pool per event loop
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.use_dns_cache = use_dns_cache
+        self.ttl_dns_cache = ttl_dns_cache
+        self.keepalive_timeout = keepalive_timeout
+        self.connector_kwargs = connector_kwargs
+        self._proxy_url_to_session: dict[str | None, aiohttp.ClientSession] = {}
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    async def __aenter__(self):
+        await self.startup()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.shutdown()
+
+    async def startup(self):
+        await self.get_session(proxy_url=None)
+
+    async def shutdown(self):
+        sessions = list(self._proxy_url_to_session.values())
+        self._proxy_url_to_session.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+
+    def _make_connector(self, proxy_url: str | None) -> aiohttp.TCPConnector:
+        connector_kwargs = {
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "use_dns_cache": self.use_dns_cache,
+            "ttl_dns_cache": self.ttl_dns_cache,
+            "keepalive_timeout": self.keepalive_timeout,
+            **self.connector_kwargs
+        }
+        if proxy_url:
+            return ProxyConnector.from_url(proxy_url, **connector_kwargs)
+        return aiohttp.TCPConnector(**connector_kwargs)
+
+    async def get_session(self, proxy_url: str | None = None) -> aiohttp.ClientSession:
+        session = self._proxy_url_to_session.get(proxy_url)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(connector=self._make_connector(proxy_url))
+            self._proxy_url_to_session[proxy_url] = session
+        return session
+
+    def get_proxy_urls(self) -> list[str | None]:
+        return list(self._proxy_url_to_session.keys())
+
+
+def get_status_and_retry_after_from_exception(exception: BaseException) -> tuple[int | None, timedelta | None]:
+    status, headers = None, None
+    if isinstance(exception, requests.HTTPError) and exception.response is not None:
+        status, headers = exception.response.status_code, exception.response.headers
+    elif isinstance(exception, aiohttp.ClientResponseError):
+        status, headers = exception.status, exception.headers
+    retry_after = parse_retry_after(headers.get("Retry-After")) if headers else None
+    return status, retry_after
+
+
+def _get_retry_delay_for_status(
+        *,
+        retry_state: RetryState | None,
+        status: int,
+        headers: Any,
+        not_raise_for_statuses: list[int] | set[int] | None
+) -> float | None:
+    if retry_state is None:
+        return None
+    if not_raise_for_statuses and status in not_raise_for_statuses:
+        return None
+    if not retry_state.retry_policy.is_status_retryable(status):
+        return None
+    return retry_state.next_delay(status=status, retry_after=parse_retry_after(headers.get("Retry-After")))
+
+
+@contextmanager
+def _sync_limit_http_request_try(*, request_limiters: list[RequestLimiter] | None) -> Iterator[None]:
+    with ExitStack() as exit_stack:
+        for request_limiter in (request_limiters if request_limiters is not None else []):
+            exit_stack.enter_context(request_limiter.sync_limit())
+        yield
+
+
+@asynccontextmanager
+async def _async_limit_http_request_try(*, request_limiters: list[RequestLimiter] | None) -> AsyncIterator[None]:
+    async with AsyncExitStack() as exit_stack:
+        for request_limiter in (request_limiters if request_limiters is not None else []):
+            await exit_stack.enter_async_context(request_limiter.async_limit())
+        yield
+
+
 def sync_make_http_request(
         *,
         method: str = "GET",
@@ -29,6 +211,9 @@ def sync_make_http_request(
         enable_logging_: bool = False,
         exception_class_: type[Exception] | None = None,
         retry_delay_timeout: timedelta | int | None = timedelta(seconds=0.1),
+        session_pool_: SyncHTTPSessionPool | None = None,
+        retry_policy_: RetryPolicy | None = None,
+        request_limiters_: list[RequestLimiter] | None = None,
         **kwargs
 ) -> requests.Response:
     if isinstance(retry_delay_timeout, int):
@@ -58,13 +243,38 @@ def sync_make_http_request(
     if "allow_redirects" not in kwargs:
         kwargs["allow_redirects"] = True
 
+    # with retry_policy_ max_tries_ and retry_delay_timeout are not used,
+    # request_limiters_ are applied to every try, RateLimiterTimeoutError is not retried
+    retry_state = retry_policy_.make_state() if retry_policy_ is not None else None
+    retry_state_exhausted = False
+
     if enable_logging_:
         _logger.info(f"try http {method} {url} {params}")
 
     while True:
         tries_counter += 1
         try:
-            response = requests.request(**kwargs)
+            with _sync_limit_http_request_try(request_limiters=request_limiters_):
+                if session_pool_ is not None:
+                    response = session_pool_.get_session().request(**kwargs)
+                else:
+                    response = requests.request(**kwargs)
+            retry_delay = _get_retry_delay_for_status(
+                retry_state=retry_state,
+                status=response.status_code,
+                headers=response.headers,
+                not_raise_for_statuses=not_raise_for_statuses_
+            )
+            if retry_delay is not None:
+                if enable_logging_:
+                    _logger.warning(
+                        f"{tries_counter}, retryable status {response.status_code} {method} {url} {params}, "
+                        f"retry after {retry_delay}s"
+                    )
+                response.close()
+                sync_safe_sleep(retry_delay)
+                continue
+            retry_state_exhausted = retry_state is not None
             if raise_for_status_:
                 if not_raise_for_statuses_ and response.status_code in not_raise_for_statuses_:
                     if enable_logging_:
@@ -93,7 +303,26 @@ def sync_make_http_request(
             if enable_logging_:
                 _logger.info(f"good try http {method} {url} {params}")
             return response
+        except RateLimiterTimeoutError:
+            raise
         except Exception as exception:
+            if retry_state is not None:
+                retry_delay = None
+                if not retry_state_exhausted:
+                    status, retry_after = get_status_and_retry_after_from_exception(exception)
+                    retry_delay = retry_state.next_delay(exception=exception, status=status, retry_after=retry_after)
+                if enable_logging_:
+                    _logger.warning(
+                        f"{tries_counter}, bad try {method} {url} {params}, exception={exception}, "
+                        f"retry after {retry_delay}s"
+                    )
+                if retry_delay is None:
+                    if exception_class_ is not None:
+                        raise exception_class_(exception)
+                    else:
+                        raise
+                sync_safe_sleep(retry_delay)
+                continue
             if enable_logging_:
                 _logger.warning(
                     f"{tries_counter}/{max_tries_}, bad try {method} {url} {params}, exception={exception}"
@@ -122,8 +351,14 @@ async def async_make_http_request(
         enable_logging_: bool = False,
         exception_class_: type[Exception] | None = None,
         retry_delay_timeout: timedelta | int | None = timedelta(seconds=0.1),
+        session_pool_: AsyncHTTPSessionPool | None = None,
+        retry_policy_: RetryPolicy | None = None,
+        request_limiters_: list[RequestLimiter] | None = None,
+        on_response_body_: Callable[[bytes], None] | None = None,
         **kwargs
 ) -> aiohttp.ClientResponse:
+    # returned response is already read and released, aiohttp allows json() and text() for it, but read() raises,
+    # on_response_body_ gets body bytes of returned response
     if isinstance(retry_delay_timeout, int):
         retry_delay_timeout = timedelta(seconds=retry_delay_timeout)
     if retry_delay_timeout is not None:
@@ -146,50 +381,109 @@ async def async_make_http_request(
     if "allow_redirects" not in kwargs:
         kwargs["allow_redirects"] = True
 
-    proxy_connector: ProxyConnector | None = None
-    if proxy_url_:
-        proxy_connector = ProxyConnector.from_url(proxy_url_)
+    # with retry_policy_ max_tries_ and retry_delay_timeout are not used,
+    # request_limiters_ are applied to every try, RateLimiterTimeoutError is not retried
+    retry_state = retry_policy_.make_state() if retry_policy_ is not None else None
+    retry_state_exhausted = False
 
     if enable_logging_:
         _logger.info(f"try http {method} {url} {params}")
 
+    async def _handle_response(response: aiohttp.ClientResponse):
+        if raise_for_status_:
+            if not_raise_for_statuses_ and response.status in not_raise_for_statuses_:
+                if enable_logging_:
+                    _logger.info(
+                        f"ignored status {response.status} {method} {url} {params}"
+                    )
+            else:
+                try:
+                    response.raise_for_status()
+                except aiohttp.ClientResponseError:
+                    if enable_logging_:
+                        try:
+                            json_data = await response.json()
+                            _logger.error(
+                                f"bad status {method} {url} {params}"
+                                f"{transfer_data_to_json_str(data=json_data, beautify=True)}"
+                            )
+                        except Exception:
+                            try:
+                                text = await response.text()
+                                _logger.error(
+                                    f"bad status {method} {url} {params}"
+                                    f"{text}"
+                                )
+                            except Exception:
+                                pass
+                    raise
+        body = await response.read()
+        if on_response_body_ is not None:
+            on_response_body_(body)
+        if enable_logging_:
+            _logger.info(f"good try {method} {url} {params}")
+
     while True:
         tries_counter += 1
         try:
-            async with aiohttp.ClientSession(connector=proxy_connector) as session:
-                async with session.request(**kwargs) as response:
-                    if raise_for_status_:
-                        if not_raise_for_statuses_ and response.status in not_raise_for_statuses_:
-                            if enable_logging_:
-                                _logger.info(
-                                    f"ignored status {response.status} {method} {url} {params}"
-                                )
-                        else:
-                            try:
-                                response.raise_for_status()
-                            except aiohttp.ClientResponseError:
-                                if enable_logging_:
-                                    try:
-                                        json_data = await response.json()
-                                        _logger.error(
-                                            f"bad status {method} {url} {params}"
-                                            f"{transfer_data_to_json_str(data=json_data, beautify=True)}"
-                                        )
-                                    except Exception:
-                                        try:
-                                            text = await response.text()
-                                            _logger.error(
-                                                f"bad status {method} {url} {params}"
-                                                f"{text}"
-                                            )
-                                        except Exception:
-                                            pass
-                                raise
-                    await response.read()
-                    if enable_logging_:
-                        _logger.info(f"good try {method} {url} {params}")
-                    return response
+            async with _async_limit_http_request_try(request_limiters=request_limiters_):
+                if session_pool_ is not None:
+                    session = await session_pool_.get_session(proxy_url=proxy_url_)
+                    async with session.request(**kwargs) as response:
+                        retry_delay = _get_retry_delay_for_status(
+                            retry_state=retry_state,
+                            status=response.status,
+                            headers=response.headers,
+                            not_raise_for_statuses=not_raise_for_statuses_
+                        )
+                        if retry_delay is None:
+                            retry_state_exhausted = retry_state is not None
+                            await _handle_response(response)
+                            return response
+                else:
+                    # session closes its connector, so connector is created for every try
+                    proxy_connector: ProxyConnector | None = None
+                    if proxy_url_:
+                        proxy_connector = ProxyConnector.from_url(proxy_url_)
+                    async with aiohttp.ClientSession(connector=proxy_connector) as session:
+                        async with session.request(**kwargs) as response:
+                            retry_delay = _get_retry_delay_for_status(
+                                retry_state=retry_state,
+                                status=response.status,
+                                headers=response.headers,
+                                not_raise_for_statuses=not_raise_for_statuses_
+                            )
+                            if retry_delay is None:
+                                retry_state_exhausted = retry_state is not None
+                                await _handle_response(response)
+                                return response
+            if enable_logging_:
+                _logger.warning(
+                    f"{tries_counter}, retryable status {response.status} {method} {url} {params}, "
+                    f"retry after {retry_delay}s"
+                )
+            await async_safe_sleep(retry_delay)
+            continue
+        except RateLimiterTimeoutError:
+            raise
         except Exception as exception:
+            if retry_state is not None:
+                retry_delay = None
+                if not retry_state_exhausted:
+                    status, retry_after = get_status_and_retry_after_from_exception(exception)
+                    retry_delay = retry_state.next_delay(exception=exception, status=status, retry_after=retry_after)
+                if enable_logging_:
+                    _logger.warning(
+                        f"{tries_counter}, bad try {method} {url} {params}, exception={exception}, "
+                        f"retry after {retry_delay}s"
+                    )
+                if retry_delay is None:
+                    if exception_class_ is not None:
+                        raise exception_class_(exception)
+                    else:
+                        raise
+                await async_safe_sleep(retry_delay)
+                continue
             if enable_logging_:
                 _logger.warning(
                     f"{tries_counter}/{max_tries_}, bad try {method} {url} {params}, exception={exception}"
@@ -204,6 +498,284 @@ async def async_make_http_request(
             continue
 
 
+@asynccontextmanager
+async def async_make_streaming_http_request(
+        *,
+        method: str = "GET",
+        url: str,
+        headers: dict[str, Any] | None = None,
+        params: dict[str, Any] | None = None,
+        max_tries_: int = 9,
+        proxy_url_: str | None = None,
+        raise_for_status_: bool = True,
+        not_raise_for_statuses_: list[int] | set[int] | None = None,
+        timeout_: timedelta | None = timedelta(seconds=15),
+        enable_logging_: bool = False,
+        exception_class_: type[Exception] | None = None,
+        retry_delay_timeout: timedelta | int | None = timedelta(seconds=0.1),
+        session_pool_: AsyncHTTPSessionPool | None = None,
+        retry_policy_: RetryPolicy | None = None,
+        **kwargs
+) -> AsyncIterator[aiohttp.ClientResponse]:
+    # yields not read response, body must be read from response.content,
+    # tries are made only until response headers are received, timeout_ is for connect and every read
+    if isinstance(retry_delay_timeout, int):
+        retry_delay_timeout = timedelta(seconds=retry_delay_timeout)
+    if retry_delay_timeout is not None:
+        raise_for_type(retry_delay_timeout, timedelta)
+
+    if isinstance(timeout_, float):
+        timeout_ = timedelta(seconds=timeout_)
+    if timeout_ is not None:
+        raise_for_type(timeout_, timedelta)
+
+    kwargs["method"] = method
+    kwargs["url"] = url
+    if headers is not None:
+        kwargs["headers"] = headers
+    if params is not None:
+        kwargs["params"] = params
+    if timeout_ is not None:
+        kwargs["timeout"] = aiohttp.ClientTimeout(
+            total=None, sock_connect=timeout_.total_seconds(), sock_read=timeout_.total_seconds()
+        )
+    if "allow_redirects" not in kwargs:
+        kwargs["allow_redirects"] = True
+
+    tries_counter = 0
+    retry_state = retry_policy_.make_state() if retry_policy_ is not None else None
+    retry_state_exhausted = False
+
+    if enable_logging_:
+        _logger.info(f"try streaming http {method} {url} {params}")
+
+    while True:
+        tries_counter += 1
+        own_session: aiohttp.ClientSession | None = None
+        response: aiohttp.ClientResponse | None = None
+        try:
+            if session_pool_ is not None:
+                session = await session_pool_.get_session(proxy_url=proxy_url_)
+            else:
+                proxy_connector: ProxyConnector | None = None
+                if proxy_url_:
+                    proxy_connector = ProxyConnector.from_url(proxy_url_)
+                own_session = aiohttp.ClientSession(connector=proxy_connector)
+                session = own_session
+            response = await session.request(**kwargs)
+            retry_delay = _get_retry_delay_for_status(
+                retry_state=retry_state,
+                status=response.status,
+                headers=response.headers,
+                not_raise_for_statuses=not_raise_for_statuses_
+            )
+            if retry_delay is None:
+                retry_state_exhausted = retry_state is not None
+                if raise_for_status_ and not (not_raise_for_statuses_ and response.status in not_raise_for_statuses_):
+                    response.raise_for_status()
+                break
+        except Exception as exception:
+            if response is not None:
+                response.release()
+            if own_session is not None:
+                await own_session.close()
+            if retry_state is not None:
+                retry_delay = None
+                if not retry_state_exhausted:
+                    status, retry_after = get_status_and_retry_after_from_exception(exception)
+                    retry_delay = retry_state.next_delay(exception=exception, status=status, retry_after=retry_after)
+            else:
+                retry_delay = retry_delay_timeout.total_seconds() if retry_delay_timeout is not None else 0.0
+                if tries_counter >= max_tries_:
+                    retry_delay = None
+            if enable_logging_:
+                _logger.warning(
+                    f"{tries_counter}/{max_tries_}, bad streaming try {method} {url} {params}, "
+                    f"exception={exception}, retry after {retry_delay}s"
+                )
+            if retry_delay is None:
+                if exception_class_ is not None:
+                    raise exception_class_(exception)
+                else:
+                    raise
+            await async_safe_sleep(retry_delay)
+            continue
+        response.release()
+        if own_session is not None:
+            await own_session.close()
+        if enable_logging_:
+            _logger.warning(
+                f"{tries_counter}, retryable status {response.status} {method} {url} {params}, "
+                f"retry after {retry_delay}s"
+            )
+        await async_safe_sleep(retry_delay)
+
+    if enable_logging_:
+        _logger.info(f"good streaming try {method} {url} {params}")
+    try:
+        yield response
+    finally:
+        response.release()
+        if own_session is not None:
+            await own_session.close()
+
+
+async def async_iter_http_response_chunks(
+        *,
+        chunk_size: int = 64 * 1024,
+        **kwargs
+) -> AsyncIterator[bytes]:
+    # kwargs are passed to async_make_streaming_http_request
+    async with async_make_streaming_http_request(**kwargs) as response:
+        async for chunk in response.content.iter_chunked(chunk_size):
+            yield chunk
+
+
+class HTTPDownloadResult(BaseModel):
+    filepath: str
+    size: int
+    status: int
+    headers: dict[str, str]
+    hash_algorithm: str | None = None
+    hash_hexdigest: str | None = None
+
+
+async def async_download_http_file(
+        *,
+        url: str,
+        filepath: str | None = None,
+        file_storage_in_dir: FileStorageInDir | None = None,
+        filename: str | None = None,
+        file_extension: str | None = None,
+        chunk_size: int = 64 * 1024,
+        hash_algorithm: str | None = None,
+        **kwargs
+) -> HTTPDownloadResult:
+    # writes to temp file and renames it after full download, so partial file never appears at filepath,
+    # kwargs are passed to async_make_streaming_http_request
+    if (filepath is None) == (file_storage_in_dir is None):
+        raise ValueError("one of filepath or file_storage_in_dir must be set")
+    if file_storage_in_dir is not None:
+        filepath = file_storage_in_dir.generate_filepath(filename=filename, file_extension=file_extension)
+    filepath = os.path.abspath(filepath)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+    hash_obj = hashlib.new(hash_algorithm) if hash_algorithm is not None else None
+    tmp_filepath = f"{filepath}.{uuid.uuid4().hex}.part"
+    size = 0
+    try:
+        async with async_make_streaming_http_request(url=url, **kwargs) as response:
+            with open(tmp_filepath, mode="wb") as f:
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    f.write(chunk)
+                    size += len(chunk)
+                    if hash_obj is not None:
+                        hash_obj.update(chunk)
+            status = response.status
+            headers = dict(response.headers)
+        os.replace(tmp_filepath, filepath)
+    except BaseException:
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+        raise
+
+    return HTTPDownloadResult(
+        filepath=filepath,
+        size=size,
+        status=status,
+        headers=headers,
+        hash_algorithm=hash_algorithm,
+        hash_hexdigest=hash_obj.hexdigest() if hash_obj is not None else None
+    )
+
+
+class HTTPBatchItemResult(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: int
+    request: dict[str, Any]
+    response: aiohttp.ClientResponse | None = None
+    exception: Exception | None = None
+
+    @property
+    def is_ok(self) -> bool:
+        return self.exception is None
+
+
+async def _async_make_http_request_for_batch(
+        *,
+        index: int,
+        request: dict[str, Any],
+        semaphore: asyncio.Semaphore,
+        session_pool: AsyncHTTPSessionPool,
+        common_kwargs: dict[str, Any]
+) -> HTTPBatchItemResult:
+    async with semaphore:
+        try:
+            response = await async_make_http_request(
+                **{"session_pool_": session_pool, **common_kwargs, **request}
+            )
+        except Exception as exception:
+            return HTTPBatchItemResult(index=index, request=request, exception=exception)
+        return HTTPBatchItemResult(index=index, request=request, response=response)
+
+
+async def async_iter_http_requests_batch_as_completed(
+        requests_: list[dict[str, Any]],
+        *,
+        concurrency: int = 10,
+        session_pool_: AsyncHTTPSessionPool | None = None,
+        **common_kwargs
+) -> AsyncIterator[HTTPBatchItemResult]:
+    # requests_ are kwargs for async_make_http_request (merged over common_kwargs),
+    # results are yielded as they finish, exceptions are returned in results and not raised,
+    # if session_pool_ is not set, one pool is created for the batch
+    if concurrency < 1:
+        raise ValueError("concurrency < 1")
+    own_session_pool: AsyncHTTPSessionPool | None = None
+    if session_pool_ is None:
+        own_session_pool = AsyncHTTPSessionPool(limit=concurrency)
+        session_pool_ = own_session_pool
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [
+        asyncio.create_task(_async_make_http_request_for_batch(
+            index=index,
+            request=request,
+            semaphore=semaphore,
+            session_pool=session_pool_,
+            common_kwargs=common_kwargs
+        ))
+        for index, request in enumerate(requests_)
+    ]
+    try:
+        for future in asyncio.as_completed(tasks):
+            yield await future
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if own_session_pool is not None:
+            await own_session_pool.shutdown()
+
+
+async def async_make_http_requests_batch(
+        requests_: list[dict[str, Any]],
+        *,
+        concurrency: int = 10,
+        session_pool_: AsyncHTTPSessionPool | None = None,
+        **common_kwargs
+) -> list[HTTPBatchItemResult]:
+    # results are in order of requests_
+    results: list[HTTPBatchItemResult | None] = [None] * len(requests_)
+    async for result in async_iter_http_requests_batch_as_completed(
+            requests_, concurrency=concurrency, session_pool_=session_pool_, **common_kwargs
+    ):
+        results[result.index] = result
+    return results
+
+
 def __example():
     pass
 
@@ -0,0 +1,444 @@
+# arpakit
+
+import asyncio
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Awaitable
+
+import aiohttp
+import requests
+from arpakitlib.ar_cache_file_util import CacheFile
+from arpakitlib.ar_http_request_util import sync_make_http_request, async_make_http_request
+from pydantic import BaseModel
+
+_CACHEABLE_METHODS = {"GET", "HEAD"}
+
+# values of these request headers are a part of cache key, so responses of different credentials are not mixed
+DEFAULT_HTTP_RESPONSE_CACHE_KEY_HEADER_NAMES = (
+    "Authorization", "Proxy-Authorization", "Cookie", "X-Api-Key", "Api-Key"
+)
+
+
+class CachedHTTPResponse(BaseModel):
+    status: int
+    headers: dict[str, str]
+    body: bytes
+    url: str
+    from_cache: bool = False
+    revalidated: bool = False
+
+    def text(self, encoding: str = "utf-8") -> str:
+        return self.body.decode(encoding)
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+def parse_cache_control(value: str | None) -> dict[str, str | None]:
+    res = {}
+    if not value:
+        return res
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "=" in part:
+            k, v = part.split("=", 1)
+            res[k.strip().lower()] = v.strip().strip('"')
+        else:
+            res[part.lower()] = None
+    return res
+
+
+def _get_header(headers: dict[str, str], name: str) -> str | None:
+    name = name.lower()
+    for k, v in headers.items():
+        if k.lower() == name:
+            return v
+    return None
+
+
+def _parse_http_date_to_ts(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class MemoryHTTPResponseCacheBackend:
+
+    def __init__(self, *, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._key_to_entry: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._key_to_entry.get(key)
+            if entry is not None:
+                self._key_to_entry.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict[str, Any]):
+        with self._lock:
+            self._key_to_entry[key] = entry
+            self._key_to_entry.move_to_end(key)
+            while len(self._key_to_entry) > self.max_entries:
+                self._key_to_entry.popitem(last=False)
+
+    def remove(self, key: str):
+        with self._lock:
+            self._key_to_entry.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._key_to_entry.clear()
+
+
+class CacheFileHTTPResponseCacheBackend:
+
+    def __init__(self, *, cache_file: CacheFile):
+        # body is stored as base64, limits and eviction are managed by cache_file
+        self.cache_file = cache_file
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        cache_block = self.cache_file.get_block(key)
+        if cache_block is None:
+            return None
+        entry = dict(cache_block.data)
+        entry["body"] = base64.b64decode(entry.pop("body_base64"))
+        return entry
+
+    def set(self, key: str, entry: dict[str, Any]):
+        data = {k: v for k, v in entry.items() if k != "body"}
+        data["body_base64"] = base64.b64encode(entry["body"]).decode()
+        self.cache_file.set_block(key=key, data=data)
+
+    def remove(self, key: str):
+        self.cache_file.remove_block(key)
+
+    def clear(self):
+        self.cache_file.remove_blocks()
+
+
+class HTTPResponseCache:
+
+    def __init__(
+            self,
+            *,
+            backend: MemoryHTTPResponseCacheBackend | CacheFileHTTPResponseCacheBackend | None = None,
+            default_ttl: timedelta | None = None,
+            cacheable_statuses: set[int] | None = None,
+            key_header_names: tuple[str, ...] = DEFAULT_HTTP_RESPONSE_CACHE_KEY_HEADER_NAMES
+    ):
+        # private (client side) cache, default_ttl is used when response has no max-age/Expires,
+        # one cache can be shared by clients with different credentials: key_header_names and scope are in key
+        self.key_header_names = key_header_names
+        self.backend = backend if backend is not None else MemoryHTTPResponseCacheBackend()
+        self.default_ttl = default_ttl
+        self.cacheable_statuses = cacheable_statuses if cacheable_statuses is not None else {200, 203, 301, 308}
+        self._hits = 0
+        self._revalidations = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create_in_memory(cls, *, max_entries: int = 1000, **kwargs) -> "HTTPResponseCache":
+        return cls(backend=MemoryHTTPResponseCacheBackend(max_entries=max_entries), **kwargs)
+
+    @classmethod
+    def create_on_disk(cls, *, cache_file: CacheFile, **kwargs) -> "HTTPResponseCache":
+        return cls(backend=CacheFileHTTPResponseCacheBackend(cache_file=cache_file), **kwargs)
+
+    def make_key(
+            self,
+            *,
+            method: str,
+            url: str,
+            params: dict[str, Any] | None = None,
+            request_headers: dict[str, Any] | None = None,
+            scope: str | None = None
+    ) -> str:
+        # scope is for credentials that are not in headers (e.g. auth= kwarg), key is hash, so secrets are not stored
+        key_headers = []
+        for name in self.key_header_names:
+            value = _get_header(request_headers, name) if request_headers else None
+            if value is not None:
+                key_headers.append((name.lower(), str(value)))
+        raw = json.dumps(
+            [method.upper(), url, sorted((str(k), str(v)) for k, v in (params or {}).items()), key_headers, scope],
+            ensure_ascii=False
+        )
+        return f"http_response:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get_stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self._hits, "revalidations": self._revalidations, "misses": self._misses}
+
+    def clear(self):
+        self.backend.clear()
+
+    def get_entry(self, *, key: str, request_headers: dict[str, str]) -> dict[str, Any] | None:
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        for name, value in entry["vary"].items():
+            if _get_header(request_headers, name) != value:
+                return None
+        return entry
+
+    @staticmethod
+    def is_entry_fresh(entry: dict[str, Any]) -> bool:
+        if entry["no_cache"]:
+            return False
+        return entry["expires_at"] is not None and time.time() < entry["expires_at"]
+
+    @staticmethod
+    def make_conditional_headers(entry: dict[str, Any]) -> dict[str, str]:
+        headers = {}
+        if entry["etag"] is not None:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"] is not None:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def _compute_expires_at(
+            self,
+            *,
+            response_headers: dict[str, str],
+            cache_control: dict[str, str | None]
+    ) -> float | None:
+        now = time.time()
+        max_age = cache_control.get("max-age")
+        if max_age is not None:
+            try:
+                age = float(_get_header(response_headers, "Age") or 0)
+            except ValueError:
+                age = 0.0
+            try:
+                return now + float(max_age) - age
+            except ValueError:
+                return now
+        expires_ts = _parse_http_date_to_ts(_get_header(response_headers, "Expires"))
+        if expires_ts is not None:
+            date_ts = _parse_http_date_to_ts(_get_header(response_headers, "Date"))
+            return now + (expires_ts - (date_ts if date_ts is not None else now))
+        if self.default_ttl is not None:
+            return now + self.default_ttl.total_seconds()
+        return None
+
+    def store(
+            self,
+            *,
+            key: str,
+            request_headers: dict[str, str],
+            response: CachedHTTPResponse
+    ) -> bool:
+        if response.status not in self.cacheable_statuses:
+            return False
+        cache_control = parse_cache_control(_get_header(response.headers, "Cache-Control"))
+        if "no-store" in cache_control:
+            return False
+        vary = _get_header(response.headers, "Vary")
+        vary_names = [name.strip() for name in vary.split(",") if name.strip()] if vary else []
+        if "*" in vary_names:
+            return False
+        entry = {
+            "status": response.status,
+            "headers": response.headers,
+            "body": response.body,
+            "url": response.url,
+            "stored_at": time.time(),
+            "expires_at": self._compute_expires_at(response_headers=response.headers, cache_control=cache_control),
+            "no_cache": "no-cache" in cache_control,
+            "etag": _get_header(response.headers, "ETag"),
+            "last_modified": _get_header(response.headers, "Last-Modified"),
+            "vary": {name: _get_header(request_headers, name) for name in vary_names}
+        }
+        if entry["expires_at"] is None and entry["etag"] is None and entry["last_modified"] is None:
+            # can not be served fresh and can not be revalidated
+            return False
+        self.backend.set(key, entry)
+        return True
+
+    def refresh(self, *, key: str, entry: dict[str, Any], not_modified_headers: dict[str, str]) -> dict[str, Any]:
+        # 304 response updates headers and freshness of stored entry
+        headers = dict(entry["headers"])
+        for k, v in not_modified_headers.items():
+            if k.lower() in {"content-length", "content-encoding", "transfer-encoding"}:
+                continue
+            headers = {hk: hv for hk, hv in headers.items() if hk.lower() != k.lower()}
+            headers[k] = v
+        cache_control = parse_cache_control(_get_header(headers, "Cache-Control"))
+        entry = {
+            **entry,
+            "headers": headers,
+            "stored_at": time.time(),
+            "expires_at": self._compute_expires_at(response_headers=headers, cache_control=cache_control),
+            "no_cache": "no-cache" in cache_control,
+            "etag": _get_header(headers, "ETag"),
+            "last_modified": _get_header(headers, "Last-Modified")
+        }
+        if "no-store" in cache_control:
+            self.backend.remove(key)
+        else:
+            self.backend.set(key, entry)
+        return entry
+
+
+def _entry_to_cached_http_response(entry: dict[str, Any], *, revalidated: bool) -> CachedHTTPResponse:
+    return CachedHTTPResponse(
+        status=entry["status"],
+        headers=entry["headers"],
+        body=entry["body"],
+        url=entry["url"],
+        from_cache=True,
+        revalidated=revalidated
+    )
+
+
+def _make_cache_scope(*, cache_scope: str | None, auth: Any) -> str | None:
+    if auth is None:
+        return cache_scope
+    return f"{cache_scope}:{auth!r}"
+
+
+def sync_make_cached_http_request(
+        *,
+        cache: HTTPResponseCache,
+        method: str = "GET",
+        url: str,
+        headers: dict[str, Any] | None = None,
+        params: dict[str, Any] | None = None,
+        make_http_request_func: Callable[..., requests.Response] = sync_make_http_request,
+        cache_scope: str | None = None,
+        **kwargs
+) -> CachedHTTPResponse:
+    # kwargs are passed to make_http_request_func, only GET and HEAD are cached,
+    # auth headers, auth kwarg and cache_scope are a part of cache key
+    headers = dict(headers) if headers is not None else {}
+
+    def _make(request_headers: dict[str, Any]) -> CachedHTTPResponse:
+        response = make_http_request_func(method=method, url=url, headers=request_headers, params=params, **kwargs)
+        return CachedHTTPResponse(
+            status=response.status_code,
+            headers=dict(response.headers),
+            body=response.content,
+            url=str(response.url)
+        )
+
+    if method.upper() not in _CACHEABLE_METHODS:
+        return _make(headers)
+
+    key = cache.make_key(
+        method=method,
+        url=url,
+        params=params,
+        request_headers=headers,
+        scope=_make_cache_scope(cache_scope=cache_scope, auth=kwargs.get("auth"))
+    )
+    entry = cache.get_entry(key=key, request_headers=headers)
+    if entry is not None and cache.is_entry_fresh(entry):
+        cache._count("_hits")
+        return _entry_to_cached_http_response(entry, revalidated=False)
+
+    if entry is not None:
+        response = _make({**headers, **cache.make_conditional_headers(entry)})
+        if response.status == 304:
+            cache._count("_revalidations")
+            entry = cache.refresh(key=key, entry=entry, not_modified_headers=response.headers)
+            return _entry_to_cached_http_response(entry, revalidated=True)
+    else:
+        response = _make(headers)
+
+    cache._count("_misses")
+    cache.store(key=key, request_headers=headers, response=response)
+    return response
+
+
+async def async_make_cached_http_request(
+        *,
+        cache: HTTPResponseCache,
+        method: str = "GET",
+        url: str,
+        headers: dict[str, Any] | None = None,
+        params: dict[str, Any] | None = None,
+        make_http_request_func: Callable[..., Awaitable[aiohttp.ClientResponse]] = async_make_http_request,
+        cache_scope: str | None = None,
+        **kwargs
+) -> CachedHTTPResponse:
+    # kwargs are passed to make_http_request_func, only GET and HEAD are cached,
+    # auth headers, auth kwarg and cache_scope are a part of cache key, disk backend calls are made in thread
+    headers = dict(headers) if headers is not None else {}
+
+    async def _make(request_headers: dict[str, Any]) -> CachedHTTPResponse:
+        bodies: list[bytes] = []
+        response = await make_http_request_func(
+            method=method, url=url, headers=request_headers, params=params, on_response_body_=bodies.append, **kwargs
+        )
+        return CachedHTTPResponse(
+            status=response.status,
+            headers=dict(response.headers),
+            body=bodies[-1] if bodies else b"",
+            url=str(response.url)
+        )
+
+    if method.upper() not in _CACHEABLE_METHODS:
+        return await _make(headers)
+
+    in_thread = isinstance(cache.backend, CacheFileHTTPResponseCacheBackend)
+
+    async def _call(func: Callable, **func_kwargs):
+        if in_thread:
+            return await asyncio.to_thread(func, **func_kwargs)
+        return func(**func_kwargs)
+
+    key = cache.make_key(
+        method=method,
+        url=url,
+        params=params,
+        request_headers=headers,
+        scope=_make_cache_scope(cache_scope=cache_scope, auth=kwargs.get("auth"))
+    )
+    entry = await _call(cache.get_entry, key=key, request_headers=headers)
+    if entry is not None and cache.is_entry_fresh(entry):
+        cache._count("_hits")
+        return _entry_to_cached_http_response(entry, revalidated=False)
+
+    if entry is not None:
+        response = await _make({**headers, **cache.make_conditional_headers(entry)})
+        if response.status == 304:
+            cache._count("_revalidations")
+            entry = await _call(cache.refresh, key=key, entry=entry, not_modified_headers=response.headers)
+            return _entry_to_cached_http_response(entry, revalidated=True)
+    else:
+        response = await _make(headers)
+
+    cache._count("_misses")
+    await _call(cache.store, key=key, request_headers=headers, response=response)
+    return response
+
+
+def __example():
+    pass
+
+
+async def __async_example():
+    pass
+
+
+if __name__ == '__main__':
+    __example()
+    asyncio.run(__async_example())
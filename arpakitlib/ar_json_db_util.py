@@ -1,28 +1,288 @@
 # arpakit
 
+import asyncio
+import bisect
+import functools
 import json
 import logging
 import os
 import shutil
-from typing import Any, Optional, Self
+import stat
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, ExitStack
+from datetime import timedelta
+from typing import Any, Optional, Self, Callable, Iterator, ContextManager
 
+import orjson
+from arpakitlib.ar_enumeration_util import Enumeration
 from arpakitlib.ar_type_util import raise_for_type
+from arpakitlib.ar_uuid_util import uuid4_as_str, uuid7_as_str, generate_ulid
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class JSONDbFileWALOps(Enumeration):
+    set = "set"
+    rm = "rm"
+    clear = "clear"
+
+
+class JSONDbFileDurabilities(Enumeration):
+    none = "none"
+    flush = "flush"
+    fsync = "fsync"
+
+
+class JSONDbFileSerializers(Enumeration):
+    json = "json"
+    orjson = "orjson"
+
+
+class JSONDbFileRecordIdStrategies(Enumeration):
+    counter = "counter"
+    uuid4 = "uuid4"
+    uuid7 = "uuid7"
+    ulid = "ulid"
+
+
+def _get_generate_record_id_func(record_id_strategy: str) -> Optional[Callable[[], str]]:
+    # None for counter strategy
+    if record_id_strategy == JSONDbFileRecordIdStrategies.uuid4:
+        return uuid4_as_str
+    if record_id_strategy == JSONDbFileRecordIdStrategies.uuid7:
+        return uuid7_as_str
+    if record_id_strategy == JSONDbFileRecordIdStrategies.ulid:
+        return generate_ulid
+    return None
+
+
+def _is_counter_record_id(record_id: str) -> bool:
+    # isdigit() alone is True for e.g. "²", int() fails for it
+    return record_id.isascii() and record_id.isdigit()
+
+
+class JSONDbFileIndexTypes(Enumeration):
+    hash = "hash"
+    sorted = "sorted"
+
+
+def _make_hashable_index_value(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return value
+
+
+# marks record that was absent before change in transaction undo log
+_ABSENT_RECORD = object()
+
+
+class _JSONDbFileHashIndex:
+
+    def __init__(self, field: str):
+        self.field = field
+        self.value_to_record_ids: dict[Any, set[str]] = {}
+        self.record_id_to_value: dict[str, Any] = {}
+
+    def clear(self):
+        self.value_to_record_ids.clear()
+        self.record_id_to_value.clear()
+
+    def set(self, record_id: str, record: dict[str, Any]):
+        self.remove(record_id)
+        if not isinstance(record, dict) or self.field not in record:
+            return
+        value = _make_hashable_index_value(record[self.field])
+        self.value_to_record_ids.setdefault(value, set()).add(record_id)
+        self.record_id_to_value[record_id] = value
+
+    def remove(self, record_id: str):
+        if record_id not in self.record_id_to_value:
+            return
+        value = self.record_id_to_value.pop(record_id)
+        record_ids = self.value_to_record_ids[value]
+        record_ids.discard(record_id)
+        if not record_ids:
+            del self.value_to_record_ids[value]
+
+    def find(self, value: Any) -> list[str]:
+        return list(self.value_to_record_ids.get(_make_hashable_index_value(value), ()))
+
+
+class _JSONDbFileSortedIndex:
+
+    def __init__(self, field: str):
+        self.field = field
+        # values and record_ids are kept sorted by value and aligned by position
+        self.values: list[Any] = []
+        self.record_ids: list[str] = []
+        self.record_id_to_value: dict[str, Any] = {}
+        # None is not comparable, records with field=None are kept separately for find(None)
+        self.none_record_ids: set[str] = set()
+
+    def clear(self):
+        self.values.clear()
+        self.record_ids.clear()
+        self.record_id_to_value.clear()
+        self.none_record_ids.clear()
+
+    def set(self, record_id: str, record: dict[str, Any]):
+        self.remove(record_id)
+        if not isinstance(record, dict) or self.field not in record:
+            return
+        if record[self.field] is None:
+            self.none_record_ids.add(record_id)
+            return
+        value = record[self.field]
+        position = bisect.bisect_right(self.values, value)
+        self.values.insert(position, value)
+        self.record_ids.insert(position, record_id)
+        self.record_id_to_value[record_id] = value
+
+    def remove(self, record_id: str):
+        self.none_record_ids.discard(record_id)
+        if record_id not in self.record_id_to_value:
+            return
+        value = self.record_id_to_value.pop(record_id)
+        position = bisect.bisect_left(self.values, value)
+        while self.record_ids[position] != record_id:
+            position += 1
+        del self.values[position]
+        del self.record_ids[position]
+
+    def find(self, value: Any) -> list[str]:
+        if value is None:
+            return list(self.none_record_ids)
+        return self.find_range(min_value=value, max_value=value)
+
+    def find_range(
+            self,
+            *,
+            min_value: Any = None,
+            max_value: Any = None,
+            include_min: bool = True,
+            include_max: bool = True
+    ) -> list[str]:
+        if min_value is None:
+            start = 0
+        elif include_min:
+            start = bisect.bisect_left(self.values, min_value)
+        else:
+            start = bisect.bisect_right(self.values, min_value)
+
+        if max_value is None:
+            end = len(self.values)
+        elif include_max:
+            end = bisect.bisect_right(self.values, max_value)
+        else:
+            end = bisect.bisect_left(self.values, max_value)
+
+        return self.record_ids[start:end]
+
+
+def _with_file_lock(method):
+    @functools.wraps(method)
+    def _wrapper(self: "JSONDbFile", *args, **kwargs):
+        with self._file_lock():
+            return method(self, *args, **kwargs)
+
+    return _wrapper
 
 
 class JSONDbFile:
 
-    def __init__(self, *, filepath: str, use_memory: bool = True, beautify_json: bool = True, **kwargs):
+    def __init__(
+            self,
+            *,
+            filepath: str,
+            use_memory: bool = True,
+            beautify_json: bool = True,
+            use_wal: bool = False,
+            wal_fsync: bool = False,
+            wal_compact_threshold: int | None = 1000,
+            wal_compact_interval: timedelta | None = None,
+            atomic_write: bool = True,
+            durability: str = JSONDbFileDurabilities.flush,
+            indexes: dict[str, str] | None = None,
+            record_id_strategy: str = JSONDbFileRecordIdStrategies.counter,
+            use_file_lock: bool = False,
+            detect_file_changes: bool | None = None,
+            serializer: str = JSONDbFileSerializers.json,
+            **kwargs
+    ):
         self._logger = logging.getLogger(self.__class__.__name__)
         raise_for_type(filepath, str)
         filepath = os.path.abspath(filepath.strip())
         if not filepath:
             raise ValueError("not filepath")
+        if wal_compact_threshold is not None:
+            raise_for_type(wal_compact_threshold, int)
+            if wal_compact_threshold < 1:
+                raise ValueError("wal_compact_threshold < 1")
+        if wal_compact_interval is not None:
+            raise_for_type(wal_compact_interval, timedelta)
+        JSONDbFileDurabilities.parse_and_validate_values(durability)
+        JSONDbFileRecordIdStrategies.parse_and_validate_values(record_id_strategy)
+        JSONDbFileSerializers.parse_and_validate_values(serializer)
+        if use_file_lock is True and fcntl is None:
+            raise ValueError("use_file_lock is supported only on platforms with fcntl")
 
         self.filepath = filepath
         self.use_memory = use_memory
         self.beautify_json = beautify_json
+        self.serializer = serializer
         self.saved_json_data: Optional[dict[str, Any]] = None
 
+        # Write-ahead log: mutations are appended to wal_filepath,
+        # the snapshot (filepath) is rewritten only on compaction
+        self.use_wal = use_wal
+        self.wal_fsync = wal_fsync
+        self.wal_compact_threshold = wal_compact_threshold
+        self.wal_compact_interval = wal_compact_interval
+        self._wal_entries_count: int = 0
+        self._wal_last_compact_monotonic: float = time.monotonic()
+
+        # atomic_write: write to temp file in the same dir and rename it over filepath
+        self.atomic_write = atomic_write
+        self.durability = durability
+
+        # secondary indexes (field -> index), built lazily for json_data they were built from
+        self._indexes: dict[str, _JSONDbFileHashIndex | _JSONDbFileSortedIndex] = {}
+        self._indexes_json_data: Optional[dict[str, Any]] = None
+        if indexes is not None:
+            raise_for_type(indexes, dict)
+            for field, index_type in indexes.items():
+                self.add_index(field=field, index_type=index_type)
+
+        # counter strategy: next id is computed once per loaded json_data (max numeric id + 1)
+        self.record_id_strategy = record_id_strategy
+        self._record_id_counter: int = 0
+        self._record_id_counter_json_data: Optional[dict[str, Any]] = None
+
+        # use_file_lock: advisory fcntl lock on lock_filepath for read-modify-write cycles (multi-process)
+        # detect_file_changes: saved_json_data is reloaded when mtime/inode/size of files changed
+        self.use_file_lock = use_file_lock
+        if detect_file_changes is None:
+            detect_file_changes = use_file_lock
+        self.detect_file_changes = detect_file_changes
+        self._file_lock_depth: int = 0
+        self._file_lock_fd: Optional[int] = None
+        self._file_lock_thread_lock = threading.RLock()
+        self._saved_json_data_files_signature: Optional[tuple] = None
+
+        # transaction: changes are applied to _transaction_json_data and persisted once on commit,
+        # undo log has (record_id, old record or _ABSENT_RECORD), (None, old json_data) for clear
+        self._transaction_depth: int = 0
+        self._transaction_json_data: Optional[dict[str, Any]] = None
+        self._transaction_undo_log: list[tuple[Optional[str], Any]] = []
+        self._transaction_changes: list[dict[str, Any]] = []
+
     def __str__(self) -> str:
         return f"JSONDbFile ({self.filepath}) ({self.count_records()})"
 
@@ -40,34 +300,513 @@ class JSONDbFile:
     def dirpath(self) -> str:
         return os.path.split(self.filepath)[0]
 
+    @property
+    def wal_filepath(self) -> str:
+        return f"{self.filepath}.wal"
+
+    @property
+    def lock_filepath(self) -> str:
+        return f"{self.filepath}.lock"
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        if self.use_file_lock is not True:
+            yield
+            return
+
+        with self._file_lock_thread_lock:
+            self._file_lock_depth += 1
+            try:
+                if self._file_lock_depth == 1:
+                    if self.dirpath and not os.path.exists(self.dirpath):
+                        os.makedirs(self.dirpath, exist_ok=True)
+                    self._file_lock_fd = os.open(self.lock_filepath, os.O_RDWR | os.O_CREAT, 0o644)
+                    try:
+                        fcntl.flock(self._file_lock_fd, fcntl.LOCK_EX)
+                    except BaseException:
+                        os.close(self._file_lock_fd)
+                        self._file_lock_fd = None
+                        raise
+                yield
+            finally:
+                self._file_lock_depth -= 1
+                if self._file_lock_depth == 0 and self._file_lock_fd is not None:
+                    try:
+                        fcntl.flock(self._file_lock_fd, fcntl.LOCK_UN)
+                    finally:
+                        os.close(self._file_lock_fd)
+                        self._file_lock_fd = None
+
+    def _get_files_signature(self) -> tuple:
+        res = []
+        for filepath in ([self.filepath, self.wal_filepath] if self.use_wal is True else [self.filepath]):
+            try:
+                stat_result = os.stat(filepath)
+            except FileNotFoundError:
+                res.append(None)
+                continue
+            res.append((stat_result.st_mtime_ns, stat_result.st_ino, stat_result.st_size))
+        return tuple(res)
+
+    def _remember_files_signature(self):
+        if self.use_memory is True and self.detect_file_changes is True:
+            self._saved_json_data_files_signature = self._get_files_signature()
+
+    @_with_file_lock
     def write_json_data(self, json_data: dict[str, Any]):
         raise_for_type(json_data, dict)
 
         if self.dirpath and not os.path.exists(self.dirpath):
             os.makedirs(self.dirpath, exist_ok=True)
 
-        with open(self.filepath, mode="w", encoding="utf-8") as f:
-            f.write(json.dumps(json_data, ensure_ascii=False, indent=2 if self.beautify_json else None))
+        text = self._dump_json_data(json_data)
+        if self.atomic_write is True:
+            self._atomic_write_text(text)
+        else:
+            with open(self.filepath, mode="w", encoding="utf-8") as f:
+                f.write(text)
+                self._make_file_durable(f)
+
+        if self.use_wal is True:
+            # snapshot already contains everything from wal
+            self._truncate_wal()
 
         if self.use_memory is True:
             self.saved_json_data = json_data
+            self._remember_files_signature()
 
     def read_json_data(self) -> dict[str, Any]:
+        if self._transaction_json_data is not None:
+            return self._transaction_json_data
+
         if self.use_memory is True and self.saved_json_data is not None:
-            return self.saved_json_data
+            if (
+                    self.detect_file_changes is not True
+                    or self._saved_json_data_files_signature == self._get_files_signature()
+            ):
+                return self.saved_json_data
 
+        return self._load_json_data()
+
+    @_with_file_lock
+    def _load_json_data(self) -> dict[str, Any]:
         if not self.check_exists():
             self.write_json_data({})
 
-        with open(self.filepath, mode="r", encoding="utf-8") as f:
-            text_from_file = f.read()
-        json_data = json.loads(text_from_file)
+        # signature is taken before reading, so changes made during reading cause one more reload
+        files_signature = self._get_files_signature()
+        if self.serializer == JSONDbFileSerializers.orjson:
+            # orjson parses utf-8 bytes directly, without decoding to str
+            with open(self.filepath, mode="rb") as f:
+                json_data = orjson.loads(f.read())
+        else:
+            with open(self.filepath, mode="r", encoding="utf-8") as f:
+                json_data = json.loads(f.read())
+
+        if self.use_wal is True:
+            has_broken_wal_entry = self._replay_wal(json_data)
+            if has_broken_wal_entry:
+                # compact right away, so next appends do not follow the broken entry
+                self.write_json_data(json_data)
+                files_signature = self._get_files_signature()
 
         if self.use_memory is True:
             self.saved_json_data = json_data
+            self._saved_json_data_files_signature = files_signature
+
+        return json_data
+
+    def _make_file_durable(self, f, *, force_fsync: bool = False):
+        if self.durability == JSONDbFileDurabilities.none and not force_fsync:
+            return
+        f.flush()
+        if self.durability == JSONDbFileDurabilities.fsync or force_fsync:
+            os.fsync(f.fileno())
+
+    def _fsync_dirpath(self):
+        if os.name != "posix":
+            return
+        dir_fd = os.open(self.dirpath, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    def _load_json_str(self, json_str: str | bytes) -> Any:
+        if self.serializer == JSONDbFileSerializers.orjson:
+            return orjson.loads(json_str)
+        return json.loads(json_str)
 
+    def _dump_json_data(self, json_data: dict[str, Any]) -> str:
+        if self.serializer == JSONDbFileSerializers.orjson:
+            option = orjson.OPT_NON_STR_KEYS
+            if self.beautify_json:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(json_data, option=option).decode()
+        return json.dumps(json_data, ensure_ascii=False, indent=2 if self.beautify_json else None)
+
+    def _write_tmp_file(self, text: str) -> str:
+        tmp_fd, tmp_filepath = tempfile.mkstemp(prefix=f".{self.filename}.", suffix=".tmp", dir=self.dirpath)
+        try:
+            with os.fdopen(tmp_fd, mode="w", encoding="utf-8") as f:
+                f.write(text)
+                self._make_file_durable(f)
+            if os.path.exists(self.filepath):
+                os.chmod(tmp_filepath, stat.S_IMODE(os.stat(self.filepath).st_mode))
+            else:
+                os.chmod(tmp_filepath, 0o644)
+        except BaseException:
+            self._rm_tmp_file(tmp_filepath)
+            raise
+        return tmp_filepath
+
+    def _rm_tmp_file(self, tmp_filepath: str):
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+
+    def _replace_by_tmp_file(self, tmp_filepath: str):
+        try:
+            os.replace(tmp_filepath, self.filepath)
+        except BaseException:
+            self._rm_tmp_file(tmp_filepath)
+            raise
+        if self.durability == JSONDbFileDurabilities.fsync:
+            self._fsync_dirpath()
+
+    def _atomic_write_text(self, text: str):
+        self._replace_by_tmp_file(self._write_tmp_file(text))
+
+    def _truncate_wal(self):
+        if os.path.exists(self.wal_filepath):
+            with open(self.wal_filepath, mode="w", encoding="utf-8"):
+                pass
+        self._wal_entries_count = 0
+        self._wal_last_compact_monotonic = time.monotonic()
+
+    def _replay_wal(self, json_data: dict[str, Any]) -> bool:
+        self._wal_entries_count = 0
+        if not os.path.exists(self.wal_filepath):
+            return False
+
+        with open(self.wal_filepath, mode="r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+        for i, line in enumerate(lines):
+            if not line.strip():
+                continue
+            try:
+                entry = self._load_json_str(line)
+            except json.JSONDecodeError:
+                if i == len(lines) - 1:
+                    # torn last entry after crash in the middle of append
+                    self._logger.warning(f"skip broken last wal entry, wal_filepath={self.wal_filepath}")
+                    return True
+                raise
+            self._apply_wal_entry(json_data=json_data, entry=entry)
+            self._wal_entries_count += 1
+
+        return False
+
+    @staticmethod
+    def _apply_wal_entry(*, json_data: dict[str, Any], entry: dict[str, Any]):
+        op = entry["op"]
+        if op == JSONDbFileWALOps.set:
+            json_data[entry["id"]] = entry["record"]
+        elif op == JSONDbFileWALOps.rm:
+            json_data.pop(entry["id"], None)
+        elif op == JSONDbFileWALOps.clear:
+            json_data.clear()
+        else:
+            raise ValueError(f"unknown wal op={op}")
+
+    def _dump_wal_entries(self, entries: list[dict[str, Any]]) -> str:
+        if self.serializer == JSONDbFileSerializers.orjson:
+            return "".join(
+                orjson.dumps(entry, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE).decode()
+                for entry in entries
+            )
+        return "".join(
+            json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for entry in entries
+        )
+
+    def _append_wal_text(self, *, text: str, entries_count: int):
+        if not text:
+            return
+
+        if self.dirpath and not os.path.exists(self.dirpath):
+            os.makedirs(self.dirpath, exist_ok=True)
+
+        with open(self.wal_filepath, mode="a", encoding="utf-8") as f:
+            f.write(text)
+            self._make_file_durable(f, force_fsync=self.wal_fsync)
+
+        self._wal_entries_count += entries_count
+        self._remember_files_signature()
+
+    def _append_wal_entries(self, entries: list[dict[str, Any]]):
+        self._append_wal_text(text=self._dump_wal_entries(entries), entries_count=len(entries))
+
+    def _need_compact_wal(self) -> bool:
+        if self.wal_compact_threshold is not None and self._wal_entries_count >= self.wal_compact_threshold:
+            return True
+        if self.wal_compact_interval is not None and self._wal_entries_count > 0:
+            seconds_after_compact = time.monotonic() - self._wal_last_compact_monotonic
+            if seconds_after_compact >= self.wal_compact_interval.total_seconds():
+                return True
+        return False
+
+    def _save_changes(self, *, json_data: dict[str, Any], changes: list[dict[str, Any]]):
+        # changes have wal entry format
+        if self._transaction_json_data is not None:
+            self._transaction_changes.extend(changes)
+        elif self.use_wal is not True:
+            self.write_json_data(json_data)
+        else:
+            if not self.check_exists():
+                self.write_json_data({})
+            self._append_wal_entries(changes)
+            if self.use_memory is True:
+                self.saved_json_data = json_data
+            if self._need_compact_wal():
+                self.compact()
+
+        if self._indexes and self._indexes_json_data is json_data:
+            try:
+                for change in changes:
+                    self._apply_change_to_indexes(change)
+            except TypeError as exception:
+                # e.g. not comparable values in sorted index, indexes will be rebuilt on next find
+                self._logger.warning(f"indexes were not updated, exception={exception}")
+                self._indexes_json_data = None
+
+    def add_index(self, *, field: str, index_type: str = JSONDbFileIndexTypes.hash):
+        raise_for_type(field, str)
+        JSONDbFileIndexTypes.parse_and_validate_values(index_type)
+        if index_type == JSONDbFileIndexTypes.hash:
+            self._indexes[field] = _JSONDbFileHashIndex(field=field)
+        else:
+            self._indexes[field] = _JSONDbFileSortedIndex(field=field)
+        self._indexes_json_data = None
+
+    def rm_index(self, field: str):
+        self._indexes.pop(field, None)
+
+    def get_indexes(self) -> dict[str, str]:
+        return {
+            field: (
+                JSONDbFileIndexTypes.hash
+                if isinstance(index, _JSONDbFileHashIndex)
+                else JSONDbFileIndexTypes.sorted
+            )
+            for field, index in self._indexes.items()
+        }
+
+    def _apply_change_to_indexes(self, change: dict[str, Any]):
+        for index in self._indexes.values():
+            if change["op"] == JSONDbFileWALOps.set:
+                index.set(change["id"], change["record"])
+            elif change["op"] == JSONDbFileWALOps.rm:
+                index.remove(change["id"])
+            elif change["op"] == JSONDbFileWALOps.clear:
+                index.clear()
+
+    def _get_json_data_with_indexes(self) -> dict[str, Any]:
+        json_data = self.read_json_data()
+        if self._indexes_json_data is not json_data:
+            for index in self._indexes.values():
+                index.clear()
+                for record_id, record in json_data.items():
+                    index.set(record_id, record)
+            self._indexes_json_data = json_data
         return json_data
 
+    def find_by(self, field: str, value: Any) -> list[tuple[str, dict[str, Any]]]:
+        raise_for_type(field, str)
+        if field not in self._indexes:
+            return [
+                (record_id, record)
+                for record_id, record in self.get_records()
+                if isinstance(record, dict) and field in record and record[field] == value
+            ]
+        json_data = self._get_json_data_with_indexes()
+        return [(record_id, json_data[record_id]) for record_id in self._indexes[field].find(value)]
+
+    def find_one_by(self, field: str, value: Any) -> Optional[tuple[str, dict[str, Any]]]:
+        records = self.find_by(field=field, value=value)
+        return records[0] if records else None
+
+    def find_by_range(
+            self,
+            field: str,
+            *,
+            min_value: Any = None,
+            max_value: Any = None,
+            include_min: bool = True,
+            include_max: bool = True
+    ) -> list[tuple[str, dict[str, Any]]]:
+        raise_for_type(field, str)
+        if not isinstance(self._indexes.get(field), _JSONDbFileSortedIndex):
+            res = []
+            for record_id, record in self.get_records():
+                if not isinstance(record, dict) or record.get(field) is None:
+                    continue
+                value = record[field]
+                if min_value is not None and (value < min_value or (not include_min and value == min_value)):
+                    continue
+                if max_value is not None and (value > max_value or (not include_max and value == max_value)):
+                    continue
+                res.append((record_id, record))
+            return sorted(res, key=lambda item: item[1][field])
+        json_data = self._get_json_data_with_indexes()
+        record_ids = self._indexes[field].find_range(
+            min_value=min_value, max_value=max_value, include_min=include_min, include_max=include_max
+        )
+        return [(record_id, json_data[record_id]) for record_id in record_ids]
+
+    def check_in_transaction(self) -> bool:
+        return self._transaction_depth > 0
+
+    def _begin_transaction(self) -> bool:
+        self._transaction_depth += 1
+        if self._transaction_depth > 1:
+            return False
+        self._transaction_json_data = self.read_json_data()
+        self._transaction_undo_log = []
+        self._transaction_changes = []
+        return True
+
+    def _end_transaction(self):
+        self._transaction_depth = 0
+        self._transaction_json_data = None
+        self._transaction_undo_log = []
+        self._transaction_changes = []
+
+    def _rollback_transaction(self):
+        self._rollback_to_transaction_savepoint((0, 0))
+        self._end_transaction()
+
+    def _remember_transaction_undo(self, *, json_data: dict[str, Any], record_id: Optional[str]):
+        # must be called before change, records changed in place by caller are not rolled back
+        if self._transaction_json_data is not json_data:
+            return
+        if record_id is None:
+            self._transaction_undo_log.append((None, dict(json_data)))
+        else:
+            self._transaction_undo_log.append((record_id, json_data.get(record_id, _ABSENT_RECORD)))
+
+    def _make_transaction_savepoint(self) -> tuple[int, int]:
+        return len(self._transaction_undo_log), len(self._transaction_changes)
+
+    def _rollback_to_transaction_savepoint(self, savepoint: tuple[int, int]):
+        undo_log_len, changes_count = savepoint
+        # in place, saved_json_data can be the same dict
+        json_data = self._transaction_json_data
+        while len(self._transaction_undo_log) > undo_log_len:
+            record_id, old = self._transaction_undo_log.pop()
+            if record_id is None:
+                json_data.clear()
+                json_data.update(old)
+            elif old is _ABSENT_RECORD:
+                json_data.pop(record_id, None)
+            else:
+                json_data[record_id] = old
+        del self._transaction_changes[changes_count:]
+        self._indexes_json_data = None
+
+    def _reset_after_failed_commit(self):
+        # part of changes can be written already, so file is the source of truth
+        self.saved_json_data = None
+        self._indexes_json_data = None
+
+    def _prepare_transaction_commit(self) -> tuple[Callable[[], None], Callable[[], None]]:
+        # returns (finish, discard), the heavy part (serialization, temp file) is done here
+        json_data = self._transaction_json_data
+        changes = self._transaction_changes
+
+        def _after_write():
+            if self.use_memory is True:
+                self.saved_json_data = json_data
+                self._remember_files_signature()
+
+        if not changes:
+            return (lambda: None), (lambda: None)
+
+        if self.dirpath and not os.path.exists(self.dirpath):
+            os.makedirs(self.dirpath, exist_ok=True)
+
+        if self.use_wal is True:
+            wal_text = self._dump_wal_entries(changes)
+
+            def _finish():
+                if not self.check_exists():
+                    self._atomic_write_text(self._dump_json_data({}))
+                self._append_wal_text(text=wal_text, entries_count=len(changes))
+                _after_write()
+                if self._need_compact_wal():
+                    self.compact()
+
+            return _finish, (lambda: None)
+
+        text = self._dump_json_data(json_data)
+
+        if self.atomic_write is not True:
+            def _finish():
+                with open(self.filepath, mode="w", encoding="utf-8") as f:
+                    f.write(text)
+                    self._make_file_durable(f)
+                _after_write()
+
+            return _finish, (lambda: None)
+
+        tmp_filepath = self._write_tmp_file(text)
+
+        def _finish():
+            self._replace_by_tmp_file(tmp_filepath)
+            _after_write()
+
+        return _finish, (lambda: self._rm_tmp_file(tmp_filepath))
+
+    @contextmanager
+    def transaction(self) -> Iterator[Self]:
+        with self._file_lock():
+            with self._transaction() as res:
+                yield res
+
+    @contextmanager
+    def _transaction(self) -> Iterator[Self]:
+        if not self._begin_transaction():
+            # nested transaction is a savepoint of the outer one, its changes are rolled back on exception
+            savepoint = self._make_transaction_savepoint()
+            try:
+                yield self
+            except BaseException:
+                self._rollback_to_transaction_savepoint(savepoint)
+                raise
+            finally:
+                self._transaction_depth -= 1
+            return
+
+        try:
+            yield self
+            finish, _ = self._prepare_transaction_commit()
+        except BaseException:
+            self._rollback_transaction()
+            raise
+
+        self._end_transaction()
+        try:
+            finish()
+        except BaseException:
+            self._reset_after_failed_commit()
+            raise
+
+    @_with_file_lock
+    def compact(self):
+        # rewrite snapshot from current data and truncate wal
+        json_data = self.read_json_data()
+        self.write_json_data(json_data)
+
     def init(self):
         if not self.check_exists():
             self.write_json_data({})
@@ -101,12 +840,30 @@ class JSONDbFile:
         return json_data[record_id] if record_id in json_data.keys() else None
 
     def generate_record_id(self) -> str:
-        record_ids = set(self.get_record_ids())
-        res = len(record_ids)
-        while str(res) in record_ids:
-            res += 1
-        return str(res)
+        json_data = self.read_json_data()
+
+        generate_func = _get_generate_record_id_func(self.record_id_strategy)
+        if generate_func is not None:
+            res = generate_func()
+            while res in json_data:
+                res = generate_func()
+            return res
 
+        if self._record_id_counter_json_data is not json_data:
+            # file was (re)loaded, it could be changed externally
+            self._record_id_counter = max(
+                (int(record_id) + 1 for record_id in json_data.keys() if _is_counter_record_id(record_id)),
+                default=0
+            )
+            self._record_id_counter_json_data = json_data
+
+        while str(self._record_id_counter) in json_data:
+            self._record_id_counter += 1
+        res = str(self._record_id_counter)
+        self._record_id_counter += 1
+        return res
+
+    @_with_file_lock
     def create_record(
             self,
             record: dict[str, Any],
@@ -120,11 +877,16 @@ class JSONDbFile:
         if record_id in json_data.keys():
             raise KeyError(f"record with record_id={record_id} already exists")
 
+        self._remember_transaction_undo(json_data=json_data, record_id=record_id)
         json_data[record_id] = record
-        self.write_json_data(json_data=json_data)
+        self._save_changes(
+            json_data=json_data,
+            changes=[{"op": JSONDbFileWALOps.set, "id": record_id, "record": record}]
+        )
 
         return record_id, record
 
+    @_with_file_lock
     def update_record(
             self,
             *,
@@ -138,36 +900,572 @@ class JSONDbFile:
         if record_id not in json_data.keys():
             raise ValueError(f"record with record_id='{record_id}' not exists")
 
+        self._remember_transaction_undo(json_data=json_data, record_id=record_id)
         json_data[record_id] = record
-        self.write_json_data(json_data)
+        self._save_changes(
+            json_data=json_data,
+            changes=[{"op": JSONDbFileWALOps.set, "id": record_id, "record": record}]
+        )
 
         return record
 
+    @_with_file_lock
     def rm_record(self, record_id: str):
         json_data = self.read_json_data()
         if record_id not in json_data.keys():
             return
+        self._remember_transaction_undo(json_data=json_data, record_id=record_id)
         del json_data[record_id]
-        self.write_json_data(json_data)
+        self._save_changes(
+            json_data=json_data,
+            changes=[{"op": JSONDbFileWALOps.rm, "id": record_id}]
+        )
 
+    @_with_file_lock
     def rm_records(self, record_ids: list[str]):
         json_data = self.read_json_data()
+        changes = []
         for record_id in list(record_ids):
             if record_id in json_data:
+                self._remember_transaction_undo(json_data=json_data, record_id=record_id)
                 del json_data[record_id]
-        self.write_json_data(json_data)
+                changes.append({"op": JSONDbFileWALOps.rm, "id": record_id})
+        self._save_changes(json_data=json_data, changes=changes)
 
+    @_with_file_lock
     def rm_all_records(self):
+        if self.check_in_transaction():
+            json_data = self.read_json_data()
+            self._remember_transaction_undo(json_data=json_data, record_id=None)
+            json_data.clear()
+            self._save_changes(json_data=json_data, changes=[{"op": JSONDbFileWALOps.clear}])
+            return
         self.write_json_data({})
 
+    def bulk_create_records(
+            self,
+            records: list[dict[str, Any]],
+            record_ids: list[str | None] | None = None
+    ) -> list[tuple[str, dict[str, Any]]]:
+        if record_ids is None:
+            record_ids = [None] * len(records)
+        if len(record_ids) != len(records):
+            raise ValueError("len(record_ids) != len(records)")
+        with self.transaction():
+            return [
+                self.create_record(record=record, record_id=record_id)
+                for record, record_id in zip(records, record_ids)
+            ]
+
+    def bulk_update_records(self, records: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
+        raise_for_type(records, dict)
+        with self.transaction():
+            return {
+                record_id: self.update_record(record_id=record_id, record=record)
+                for record_id, record in records.items()
+            }
+
     def copy(self, to_filepath: str):
         self.init()
+        if self.use_wal is True:
+            self.compact()
         shutil.copy(self.filepath, to_filepath)
-        return JSONDbFile(filepath=to_filepath, use_memory=self.use_memory, beautify_json=self.beautify_json)
+        return JSONDbFile(filepath=to_filepath, **self.get_settings())
+
+    def get_settings(self) -> dict[str, Any]:
+        return {
+            "use_memory": self.use_memory,
+            "beautify_json": self.beautify_json,
+            "serializer": self.serializer,
+            "use_wal": self.use_wal,
+            "wal_fsync": self.wal_fsync,
+            "wal_compact_threshold": self.wal_compact_threshold,
+            "wal_compact_interval": self.wal_compact_interval,
+            "atomic_write": self.atomic_write,
+            "durability": self.durability,
+            "indexes": self.get_indexes(),
+            "record_id_strategy": self.record_id_strategy,
+            "use_file_lock": self.use_file_lock,
+            "detect_file_changes": self.detect_file_changes
+        }
 
     def drop(self):
         if self.check_exists():
             os.remove(self.filepath)
+        if os.path.exists(self.wal_filepath):
+            os.remove(self.wal_filepath)
+        self._wal_entries_count = 0
+        if self.use_memory is True:
+            self.saved_json_data = None
+
+
+class ShardedJSONDbFile:
+
+    def __init__(
+            self,
+            *,
+            dirpath: str,
+            shards_count: int = 16,
+            max_workers: int | None = None,
+            record_id_strategy: str = JSONDbFileRecordIdStrategies.counter,
+            **kwargs
+    ):
+        # kwargs are passed to every shard JSONDbFile (use_memory, serializer, use_wal, ...)
+        self._logger = logging.getLogger(self.__class__.__name__)
+        raise_for_type(dirpath, str)
+        dirpath = os.path.abspath(dirpath.strip())
+        if not dirpath:
+            raise ValueError("not dirpath")
+        raise_for_type(shards_count, int)
+        if shards_count < 1:
+            raise ValueError("shards_count < 1")
+        JSONDbFileRecordIdStrategies.parse_and_validate_values(record_id_strategy)
+
+        self.dirpath = dirpath
+        self.shards_count = shards_count
+        self.max_workers = max_workers if max_workers is not None else min(shards_count, 32)
+        self.record_id_strategy = record_id_strategy
+        self.json_db_file_kwargs = kwargs
+        self._record_id_counter: Optional[int] = None
+        self._is_meta_written = False
+
+        self._check_meta()
+
+        self.shards: list[JSONDbFile] = [
+            JSONDbFile(
+                filepath=os.path.join(self.dirpath, f"shard_{shard_index:04d}.json"),
+                record_id_strategy=record_id_strategy,
+                **kwargs
+            )
+            for shard_index in range(self.shards_count)
+        ]
+
+    def __str__(self) -> str:
+        return f"ShardedJSONDbFile ({self.dirpath}) ({self.shards_count})"
+
+    def __repr__(self) -> str:
+        return f"ShardedJSONDbFile ({self.dirpath}) ({self.shards_count})"
+
+    def __len__(self) -> int:
+        return self.count_records()
+
+    @property
+    def meta_filepath(self) -> str:
+        return os.path.join(self.dirpath, "shards.json")
+
+    def _check_meta(self):
+        # records are routed by hash % shards_count, so shards_count of existing dir can not be changed
+        if not os.path.exists(self.meta_filepath):
+            if os.path.isdir(self.dirpath) and any(
+                    filename.startswith("shard_") and filename.endswith(".json")
+                    for filename in os.listdir(self.dirpath)
+            ):
+                raise ValueError(f"dir {self.dirpath} has shard files without {self.meta_filepath}")
+            return
+        with open(self.meta_filepath, mode="r", encoding="utf-8") as f:
+            meta = json.loads(f.read())
+        if meta.get("shards_count") != self.shards_count:
+            raise ValueError(
+                f"dir {self.dirpath} has shards_count={meta.get('shards_count')}, not {self.shards_count}"
+            )
+
+    def _write_meta(self):
+        if not os.path.exists(self.dirpath):
+            os.makedirs(self.dirpath, exist_ok=True)
+        with open(self.meta_filepath, mode="w", encoding="utf-8") as f:
+            f.write(json.dumps({"shards_count": self.shards_count}, ensure_ascii=False, indent=2))
+        self._is_meta_written = True
+
+    def _ensure_meta(self):
+        # meta is written before the first shard file can be created
+        if self._is_meta_written:
+            return
+        if os.path.exists(self.meta_filepath):
+            self._is_meta_written = True
+            return
+        self._write_meta()
+
+    def get_shard_index(self, record_id: str) -> int:
+        raise_for_type(record_id, str)
+        return zlib.crc32(record_id.encode()) % self.shards_count
+
+    def get_shard(self, record_id: str) -> JSONDbFile:
+        self._ensure_meta()
+        return self.shards[self.get_shard_index(record_id)]
+
+    def _map_in_parallel(self, func: Callable[[Any], Any], items: list[Any]) -> list[Any]:
+        if len(items) <= 1 or self.max_workers <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            return list(executor.map(func, items))
+
+    def _map_shards(self, func: Callable[[JSONDbFile], Any]) -> list[Any]:
+        self._ensure_meta()
+        return self._map_in_parallel(func, self.shards)
+
+    def _group_by_shard_index(self, record_ids: list[str]) -> dict[int, list[str]]:
+        res = {}
+        for record_id in record_ids:
+            res.setdefault(self.get_shard_index(record_id), []).append(record_id)
+        return res
+
+    def init(self):
+        self._map_shards(lambda shard: shard.init())
+
+    def reinit(self):
+        self.drop()
+        self.init()
+
+    def drop(self):
+        self._map_in_parallel(lambda shard: shard.drop(), self.shards)
+        if os.path.exists(self.meta_filepath):
+            os.remove(self.meta_filepath)
+        self._is_meta_written = False
+        self._record_id_counter = None
+
+    def check_exists(self) -> bool:
+        return os.path.exists(self.meta_filepath)
+
+    def get_records(self) -> list[(str, dict[str, Any])]:
+        res = []
+        for shard_records in self._map_shards(lambda shard: shard.get_records()):
+            res.extend(shard_records)
+        return res
+
+    def get_record_ids(self) -> list[str]:
+        res = []
+        for shard_record_ids in self._map_shards(lambda shard: shard.get_record_ids()):
+            res.extend(shard_record_ids)
+        return res
+
+    def scan_records(self, filter_func: Callable[[str, dict[str, Any]], bool]) -> list[(str, dict[str, Any])]:
+        res = []
+        for shard_records in self._map_shards(
+                lambda shard: [
+                    (record_id, record)
+                    for record_id, record in shard.get_records()
+                    if filter_func(record_id, record)
+                ]
+        ):
+            res.extend(shard_records)
+        return res
+
+    def find_by(self, field: str, value: Any) -> list[tuple[str, dict[str, Any]]]:
+        res = []
+        for shard_records in self._map_shards(lambda shard: shard.find_by(field=field, value=value)):
+            res.extend(shard_records)
+        return res
+
+    def find_by_range(
+            self,
+            field: str,
+            *,
+            min_value: Any = None,
+            max_value: Any = None,
+            include_min: bool = True,
+            include_max: bool = True
+    ) -> list[tuple[str, dict[str, Any]]]:
+        res = []
+        for shard_records in self._map_shards(
+                lambda shard: shard.find_by_range(
+                    field=field,
+                    min_value=min_value,
+                    max_value=max_value,
+                    include_min=include_min,
+                    include_max=include_max
+                )
+        ):
+            res.extend(shard_records)
+        return sorted(res, key=lambda item: item[1][field])
+
+    def count_records(self) -> int:
+        return sum(self._map_shards(lambda shard: shard.count_records()))
+
+    def check_record_id_exists(self, record_id: str) -> bool:
+        return self.get_shard(record_id).check_record_id_exists(record_id=record_id)
+
+    def get_record(self, record_id: str) -> Optional[dict[str, Any]]:
+        return self.get_shard(record_id).get_record(record_id=record_id)
+
+    def _generate_record_id_without_check(self) -> str:
+        generate_func = _get_generate_record_id_func(self.record_id_strategy)
+        if generate_func is not None:
+            return generate_func()
+
+        if self._record_id_counter is None:
+            # full scan once, next ids are greater than all existing ones
+            self._record_id_counter = max(
+                (int(record_id) + 1 for record_id in self.get_record_ids() if _is_counter_record_id(record_id)),
+                default=0
+            )
+        res = str(self._record_id_counter)
+        self._record_id_counter += 1
+        return res
+
+    def _remember_record_id(self, record_id: str):
+        if self._record_id_counter is not None and _is_counter_record_id(record_id):
+            self._record_id_counter = max(self._record_id_counter, int(record_id) + 1)
+
+    def generate_record_id(self) -> str:
+        res = self._generate_record_id_without_check()
+        while self.check_record_id_exists(res):
+            res = self._generate_record_id_without_check()
+        return res
+
+    def create_record(
+            self,
+            record: dict[str, Any],
+            record_id: Optional[str] = None,
+    ) -> (str, dict[str, Any]):
+        if record_id is not None:
+            self._remember_record_id(record_id)
+            return self.get_shard(record_id).create_record(record=record, record_id=record_id)
+
+        while True:
+            # the shard checks existence itself, so generated id is not read-checked twice
+            record_id = self._generate_record_id_without_check()
+            try:
+                return self.get_shard(record_id).create_record(record=record, record_id=record_id)
+            except KeyError:
+                # id was created externally
+                continue
+
+    def update_record(
+            self,
+            *,
+            record_id: str,
+            record: dict[str, Any]
+    ) -> dict[str, Any]:
+        return self.get_shard(record_id).update_record(record_id=record_id, record=record)
+
+    def rm_record(self, record_id: str):
+        self.get_shard(record_id).rm_record(record_id=record_id)
+
+    def rm_records(self, record_ids: list[str]):
+        self._ensure_meta()
+        self._map_in_parallel(
+            lambda item: self.shards[item[0]].rm_records(item[1]),
+            list(self._group_by_shard_index(list(record_ids)).items())
+        )
+
+    def rm_all_records(self):
+        self._map_shards(lambda shard: shard.rm_all_records())
+
+    def bulk_create_records(
+            self,
+            records: list[dict[str, Any]],
+            record_ids: list[str | None] | None = None
+    ) -> list[tuple[str, dict[str, Any]]]:
+        if record_ids is None:
+            record_ids = [None] * len(records)
+        if len(record_ids) != len(records):
+            raise ValueError("len(record_ids) != len(records)")
+        # all or nothing: all shards are locked and all ids are checked before any change,
+        # shard files are replaced only after every shard is serialized
+        # (crash in the middle of replacing files can still leave part of shards written)
+        self._ensure_meta()
+        with BaseJSONDb(json_db_files=self.shards).transaction():
+            for record_id in record_ids:
+                if record_id is not None:
+                    self._remember_record_id(record_id)
+
+            checked_record_ids = []
+            batch_record_ids = set()
+            for record_id in record_ids:
+                if record_id is None:
+                    record_id = self._generate_record_id_without_check()
+                    while record_id in batch_record_ids or self.check_record_id_exists(record_id):
+                        record_id = self._generate_record_id_without_check()
+                elif record_id in batch_record_ids or self.check_record_id_exists(record_id):
+                    raise KeyError(f"record with record_id={record_id} already exists")
+                batch_record_ids.add(record_id)
+                checked_record_ids.append(record_id)
+            record_ids = checked_record_ids
+
+            for record, record_id in zip(records, record_ids):
+                self.get_shard(record_id).create_record(record=record, record_id=record_id)
+
+        return list(zip(record_ids, records))
+
+    def compact(self):
+        self._map_shards(lambda shard: shard.compact())
+
+    def get_settings(self) -> dict[str, Any]:
+        return {
+            "shards_count": self.shards_count,
+            "max_workers": self.max_workers,
+            "record_id_strategy": self.record_id_strategy,
+            **self.json_db_file_kwargs
+        }
+
+
+class AsyncCoalescingExecutor:
+
+    def __init__(self, *, make_transaction: Callable[[], ContextManager]):
+        # one asyncio lock for all operations, blocking io runs in threads,
+        # writes submitted while previous flush is running are applied together in one transaction
+        self.make_transaction = make_transaction
+        self._lock: asyncio.Lock | None = None
+        self._pending_writes: list[tuple[Callable[[], Any], asyncio.Future]] = []
+        self._flush_task: asyncio.Task | None = None
+        self.flushes_count: int = 0
+        self.writes_count: int = 0
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def run_read(self, func: Callable[[], Any], *, in_thread: bool = True) -> Any:
+        async with self._get_lock():
+            if in_thread:
+                return await asyncio.to_thread(func)
+            return func()
+
+    async def run_write(self, func: Callable[[], Any]) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._pending_writes.append((func, future))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_pending_writes())
+        return await future
+
+    def _apply_writes(self, writes: list[tuple[Callable[[], Any], asyncio.Future]]) -> list[tuple[Any, Any]]:
+        results = []
+        with self.make_transaction():
+            for func, _ in writes:
+                try:
+                    # nested transaction is a savepoint (undo log of touched keys), so changes of failed write
+                    # are rolled back without copying the data
+                    with self.make_transaction():
+                        results.append((func(), None))
+                except Exception as exception:
+                    results.append((None, exception))
+        return results
+
+    async def _flush_pending_writes(self):
+        async with self._get_lock():
+            while self._pending_writes:
+                writes = self._pending_writes
+                self._pending_writes = []
+                try:
+                    results = await asyncio.to_thread(self._apply_writes, writes)
+                except BaseException as exception:
+                    for _, future in writes:
+                        if not future.done():
+                            future.set_exception(exception)
+                    if not isinstance(exception, Exception):
+                        raise
+                    continue
+                self.flushes_count += 1
+                self.writes_count += len(writes)
+                for (_, future), (result, exception) in zip(writes, results):
+                    if future.done():
+                        continue
+                    if exception is not None:
+                        future.set_exception(exception)
+                    else:
+                        future.set_result(result)
+
+    async def wait_pending_writes(self):
+        if self._flush_task is not None:
+            await asyncio.shield(self._flush_task)
+
+
+class AsyncJSONDbFile:
+
+    def __init__(self, *, json_db_file: JSONDbFile | None = None, filepath: str | None = None, **kwargs):
+        # json_db_file or filepath, kwargs are passed to JSONDbFile
+        if json_db_file is None:
+            if filepath is None:
+                raise ValueError("json_db_file is None and filepath is None")
+            json_db_file = JSONDbFile(filepath=filepath, **kwargs)
+        self.json_db_file = json_db_file
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.executor = AsyncCoalescingExecutor(make_transaction=json_db_file.transaction)
+
+    def __str__(self) -> str:
+        return f"AsyncJSONDbFile ({self.json_db_file.filepath})"
+
+    def __repr__(self) -> str:
+        return f"AsyncJSONDbFile ({self.json_db_file.filepath})"
+
+    def _need_io_for_read(self) -> bool:
+        return not (
+                self.json_db_file.use_memory is True
+                and self.json_db_file.saved_json_data is not None
+                and self.json_db_file.detect_file_changes is not True
+        )
+
+    async def _read(self, func: Callable[[], Any]) -> Any:
+        return await self.executor.run_read(func, in_thread=self._need_io_for_read())
+
+    async def init(self):
+        await self.executor.run_read(self.json_db_file.init)
+
+    async def reinit(self):
+        await self.executor.run_read(self.json_db_file.reinit)
+
+    async def drop(self):
+        await self.executor.run_read(self.json_db_file.drop)
+
+    async def compact(self):
+        await self.executor.run_read(self.json_db_file.compact)
+
+    async def read_json_data(self) -> dict[str, Any]:
+        return await self._read(self.json_db_file.read_json_data)
+
+    async def get_records(self) -> list[(str, dict[str, Any])]:
+        return await self._read(self.json_db_file.get_records)
+
+    async def get_record_ids(self) -> list[str]:
+        return await self._read(self.json_db_file.get_record_ids)
+
+    async def count_records(self) -> int:
+        return await self._read(self.json_db_file.count_records)
+
+    async def get_record(self, record_id: str) -> Optional[dict[str, Any]]:
+        return await self._read(lambda: self.json_db_file.get_record(record_id=record_id))
+
+    async def check_record_id_exists(self, record_id: str) -> bool:
+        return await self._read(lambda: self.json_db_file.check_record_id_exists(record_id=record_id))
+
+    async def find_by(self, field: str, value: Any) -> list[tuple[str, dict[str, Any]]]:
+        return await self._read(lambda: self.json_db_file.find_by(field=field, value=value))
+
+    async def find_by_range(self, field: str, **kwargs) -> list[tuple[str, dict[str, Any]]]:
+        return await self._read(lambda: self.json_db_file.find_by_range(field, **kwargs))
+
+    async def create_record(
+            self,
+            record: dict[str, Any],
+            record_id: Optional[str] = None,
+    ) -> (str, dict[str, Any]):
+        return await self.executor.run_write(
+            lambda: self.json_db_file.create_record(record=record, record_id=record_id)
+        )
+
+    async def update_record(self, *, record_id: str, record: dict[str, Any]) -> dict[str, Any]:
+        return await self.executor.run_write(
+            lambda: self.json_db_file.update_record(record_id=record_id, record=record)
+        )
+
+    async def rm_record(self, record_id: str):
+        return await self.executor.run_write(lambda: self.json_db_file.rm_record(record_id=record_id))
+
+    async def rm_records(self, record_ids: list[str]):
+        return await self.executor.run_write(lambda: self.json_db_file.rm_records(record_ids))
+
+    async def rm_all_records(self):
+        return await self.executor.run_write(self.json_db_file.rm_all_records)
+
+    async def bulk_create_records(
+            self,
+            records: list[dict[str, Any]],
+            record_ids: list[str | None] | None = None
+    ) -> list[tuple[str, dict[str, Any]]]:
+        return await self.executor.run_write(
+            lambda: self.json_db_file.bulk_create_records(records=records, record_ids=record_ids)
+        )
 
 
 class BaseJSONDb:
@@ -188,9 +1486,14 @@ class BaseJSONDb:
         return len(self.json_db_files)
 
     def create_json_db_file(
-            self, filepath: str, use_memory: bool = False, beautify_json: bool = False, **kwargs
+            self,
+            filepath: str,
+            use_memory: bool = False,
+            beautify_json: bool = False,
+            **kwargs
     ) -> JSONDbFile:
-        json_db_file = JSONDbFile(filepath=filepath, use_memory=use_memory, beautify_json=beautify_json)
+        # kwargs are passed to JSONDbFile (use_wal, atomic_write, durability, ...)
+        json_db_file = JSONDbFile(filepath=filepath, use_memory=use_memory, beautify_json=beautify_json, **kwargs)
         self.json_db_files.append(json_db_file)
         return json_db_file
 
@@ -213,14 +1516,61 @@ class BaseJSONDb:
         for json_db_file in self.json_db_files:
             json_db_file.rm_all_records()
 
+    @contextmanager
+    def transaction(self) -> Iterator[Self]:
+        # files are locked in list order, so use the same order of files in all processes
+        with ExitStack() as exit_stack:
+            for json_db_file in self.json_db_files:
+                exit_stack.enter_context(json_db_file._file_lock())
+            with self._transaction() as res:
+                yield res
+
+    @contextmanager
+    def _transaction(self) -> Iterator[Self]:
+        # all files are committed together: serialization and temp files first, then renames/appends
+        outer_json_db_files = []
+        json_db_file_to_savepoint = {}
+        try:
+            for json_db_file in self.json_db_files:
+                if json_db_file._begin_transaction():
+                    outer_json_db_files.append(json_db_file)
+                else:
+                    json_db_file._transaction_depth -= 1
+                    json_db_file_to_savepoint[json_db_file] = json_db_file._make_transaction_savepoint()
+            yield self
+        except BaseException:
+            for json_db_file in outer_json_db_files:
+                json_db_file._rollback_transaction()
+            for json_db_file, savepoint in json_db_file_to_savepoint.items():
+                json_db_file._rollback_to_transaction_savepoint(savepoint)
+            raise
+
+        finish_and_discard_funcs = []
+        try:
+            for json_db_file in outer_json_db_files:
+                finish_and_discard_funcs.append(json_db_file._prepare_transaction_commit())
+        except BaseException:
+            for _, discard in finish_and_discard_funcs:
+                discard()
+            for json_db_file in outer_json_db_files:
+                json_db_file._rollback_transaction()
+            raise
+
+        for json_db_file in outer_json_db_files:
+            json_db_file._end_transaction()
+        for json_db_file, (finish, _) in zip(outer_json_db_files, finish_and_discard_funcs):
+            try:
+                finish()
+            except BaseException:
+                json_db_file._reset_after_failed_commit()
+                raise
+
     def copy_files_to_dir(self, to_dirpath: str) -> Self:
         json_db = BaseJSONDb()
         for json_db_file in self.json_db_files:
             filepath = os.path.join(to_dirpath, json_db_file.filename)
             json_db_file.copy(filepath)
-            json_db.create_json_db_file(
-                filepath=filepath, use_memory=json_db_file.use_memory, beautify_json=json_db_file.beautify_json
-            )
+            json_db.create_json_db_file(filepath=filepath, **json_db_file.get_settings())
         return json_db
 
 
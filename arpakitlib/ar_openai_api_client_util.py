@@ -5,6 +5,7 @@ import logging
 
 import httpx
 from arpakitlib.ar_base64_util import convert_file_to_base64_string
+from arpakitlib.ar_rate_limiter_util import RequestLimiter
 from openai import OpenAI, AsyncOpenAI
 from openai.types.chat import ChatCompletion
 
@@ -18,20 +19,24 @@ class EasyOpenAIAPIClient:
             self,
             *,
             open_ai: OpenAI,
-            async_open_ai: AsyncOpenAI
+            async_open_ai: AsyncOpenAI,
+            request_limiter: RequestLimiter | None = None
     ):
         self._logger = logging.getLogger(self.__class__.__name__)
 
         self.open_ai = open_ai
         self.async_open_ai = async_open_ai
+        self.request_limiter = request_limiter if request_limiter is not None else RequestLimiter()
 
     @classmethod
     def create_easily(
             cls,
             openai_api_key: str,
-            openai_api_base_url: str | None = "https://api.proxyapi.ru/openai/v1"
+            openai_api_base_url: str | None = "https://api.proxyapi.ru/openai/v1",
+            request_limiter: RequestLimiter | None = None
     ) -> EasyOpenAIAPIClient:
         return EasyOpenAIAPIClient(
+            request_limiter=request_limiter,
             open_ai=OpenAI(
                 api_key=openai_api_key,
                 base_url=openai_api_base_url,
@@ -59,7 +64,8 @@ class EasyOpenAIAPIClient:
         )
 
     def check_conn(self):
-        self.open_ai.models.list()
+        with self.request_limiter.sync_limit():
+            self.open_ai.models.list()
 
     def is_conn_good(self) -> bool:
         try:
@@ -70,7 +76,8 @@ class EasyOpenAIAPIClient:
         return False
 
     async def async_check_conn(self):
-        await self.async_open_ai.models.list()
+        async with self.request_limiter.async_limit():
+            await self.async_open_ai.models.list()
 
     async def async_is_conn_good(self) -> bool:
         try:
@@ -124,14 +131,15 @@ class EasyOpenAIAPIClient:
             "content": content
         })
 
-        response: ChatCompletion = self.open_ai.chat.completions.create(
-            model=model,
-            messages=messages,
-            n=1,
-            temperature=0.1,
-            top_p=0.9,
-            max_tokens=1000
-        )
+        with self.request_limiter.sync_limit():
+            response: ChatCompletion = self.open_ai.chat.completions.create(
+                model=model,
+                messages=messages,
+                n=1,
+                temperature=0.1,
+                top_p=0.9,
+                max_tokens=1000
+            )
 
         return response
 
@@ -179,14 +187,15 @@ class EasyOpenAIAPIClient:
             "content": content
         })
 
-        response: ChatCompletion = await self.async_open_ai.chat.completions.create(
-            model=model,
-            messages=messages,
-            n=1,
-            temperature=0.1,
-            top_p=0.9,
-            max_tokens=1000
-        )
+        async with self.request_limiter.async_limit():
+            response: ChatCompletion = await self.async_open_ai.chat.completions.create(
+                model=model,
+                messages=messages,
+                n=1,
+                temperature=0.1,
+                top_p=0.9,
+                max_tokens=1000
+            )
 
         return response
 
@@ -0,0 +1,195 @@
+# arpakit
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+from datetime import timedelta
+from typing import Iterator, AsyncIterator
+
+from arpakitlib.ar_sleep_util import sync_safe_sleep, async_safe_sleep
+
+
+class RateLimiterTimeoutError(Exception):
+    pass
+
+
+class TokenBucketRateLimiter:
+
+    def __init__(self, *, rate: float, capacity: float | None = None):
+        # rate - tokens per second, capacity - max burst,
+        # tokens are reserved in order of calls, so waiting calls are spread evenly (leaky bucket)
+        if rate <= 0:
+            raise ValueError("rate <= 0")
+        if capacity is None:
+            capacity = max(1.0, rate)
+        if capacity <= 0:
+            raise ValueError("capacity <= 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_period(cls, *, max_calls: int, period: timedelta, capacity: float | None = None) -> "TokenBucketRateLimiter":
+        return cls(rate=max_calls / period.total_seconds(), capacity=capacity)
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def _reserve(self, *, tokens: float, max_wait: timedelta | None) -> float:
+        if tokens > self.capacity:
+            raise ValueError(f"tokens={tokens} > capacity={self.capacity}")
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = max(tokens - self._tokens, 0.0) / self.rate
+            if max_wait is not None and wait > max_wait.total_seconds():
+                raise RateLimiterTimeoutError(f"wait={wait}s > max_wait={max_wait}")
+            self._tokens -= tokens
+            return wait
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        try:
+            self._reserve(tokens=tokens, max_wait=timedelta(seconds=0))
+        except RateLimiterTimeoutError:
+            return False
+        return True
+
+    def sync_acquire(self, tokens: float = 1, *, max_wait: timedelta | None = None):
+        wait = self._reserve(tokens=tokens, max_wait=max_wait)
+        if wait > 0:
+            sync_safe_sleep(wait)
+
+    async def async_acquire(self, tokens: float = 1, *, max_wait: timedelta | None = None):
+        wait = self._reserve(tokens=tokens, max_wait=max_wait)
+        if wait > 0:
+            await async_safe_sleep(wait)
+
+    def get_available_tokens(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class ConcurrencyLimiter:
+
+    def __init__(self, *, max_concurrency: int):
+        # sync and async calls are limited separately,
+        # asyncio semaphore is created lazily, so limiter must be used in one event loop
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency < 1")
+        self.max_concurrency = max_concurrency
+        self._sync_semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._async_semaphore: asyncio.Semaphore | None = None
+        self._sync_in_progress = 0
+        self._async_in_progress = 0
+        self._lock = threading.Lock()
+
+    def _get_async_semaphore(self) -> asyncio.Semaphore:
+        if self._async_semaphore is None:
+            self._async_semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._async_semaphore
+
+    @contextmanager
+    def sync_limit(self, *, max_wait: timedelta | None = None) -> Iterator[None]:
+        if not self._sync_semaphore.acquire(timeout=max_wait.total_seconds() if max_wait is not None else None):
+            raise RateLimiterTimeoutError(f"no free slot for max_wait={max_wait}")
+        with self._lock:
+            self._sync_in_progress += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._sync_in_progress -= 1
+            self._sync_semaphore.release()
+
+    @asynccontextmanager
+    async def async_limit(self, *, max_wait: timedelta | None = None) -> AsyncIterator[None]:
+        semaphore = self._get_async_semaphore()
+        if max_wait is None:
+            await semaphore.acquire()
+        else:
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout=max_wait.total_seconds())
+            except asyncio.TimeoutError:
+                raise RateLimiterTimeoutError(f"no free slot for max_wait={max_wait}")
+        self._async_in_progress += 1
+        try:
+            yield
+        finally:
+            self._async_in_progress -= 1
+            semaphore.release()
+
+    def get_in_progress(self) -> int:
+        with self._lock:
+            return self._sync_in_progress + self._async_in_progress
+
+
+class RequestLimiter:
+
+    def __init__(
+            self,
+            *,
+            rate_limiter: TokenBucketRateLimiter | None = None,
+            concurrency_limiter: ConcurrencyLimiter | None = None,
+            max_wait: timedelta | None = None
+    ):
+        self.rate_limiter = rate_limiter
+        self.concurrency_limiter = concurrency_limiter
+        self.max_wait = max_wait
+
+    @classmethod
+    def create_easily(
+            cls,
+            *,
+            rate: float | None = None,
+            capacity: float | None = None,
+            max_concurrency: int | None = None,
+            max_wait: timedelta | None = None
+    ) -> "RequestLimiter":
+        return cls(
+            rate_limiter=TokenBucketRateLimiter(rate=rate, capacity=capacity) if rate is not None else None,
+            concurrency_limiter=(
+                ConcurrencyLimiter(max_concurrency=max_concurrency) if max_concurrency is not None else None
+            ),
+            max_wait=max_wait
+        )
+
+    @contextmanager
+    def sync_limit(self) -> Iterator[None]:
+        if self.concurrency_limiter is None:
+            if self.rate_limiter is not None:
+                self.rate_limiter.sync_acquire(max_wait=self.max_wait)
+            yield
+            return
+        with self.concurrency_limiter.sync_limit(max_wait=self.max_wait):
+            if self.rate_limiter is not None:
+                self.rate_limiter.sync_acquire(max_wait=self.max_wait)
+            yield
+
+    @asynccontextmanager
+    async def async_limit(self) -> AsyncIterator[None]:
+        if self.concurrency_limiter is None:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.async_acquire(max_wait=self.max_wait)
+            yield
+            return
+        async with self.concurrency_limiter.async_limit(max_wait=self.max_wait):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.async_acquire(max_wait=self.max_wait)
+            yield
+
+
+def __example():
+    pass
+
+
+async def __async_example():
+    pass
+
+
+if __name__ == '__main__':
+    __example()
+    asyncio.run(__async_example())
@@ -2,10 +2,161 @@
 
 
 import asyncio
-from datetime import timedelta
-from typing import Any
+import random
+import time
+from datetime import timedelta, datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable
 
+from arpakitlib.ar_enumeration_util import Enumeration
 from arpakitlib.ar_sleep_util import sync_safe_sleep, async_safe_sleep
+from arpakitlib.ar_type_util import raise_for_type
+
+
+class RetryPolicyJitters(Enumeration):
+    none = "none"
+    full = "full"
+    decorrelated = "decorrelated"
+
+
+def parse_retry_after(value: str | int | float | None) -> timedelta | None:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return timedelta(seconds=max(float(value), 0.0))
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return timedelta(seconds=max(float(value), 0.0))
+    except ValueError:
+        pass
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return max(dt - datetime.now(tz=timezone.utc), timedelta(seconds=0))
+
+
+class RetryPolicy:
+
+    def __init__(
+            self,
+            *,
+            max_tries: int = 5,
+            endlessly: bool = False,
+            base_delay: timedelta = timedelta(seconds=0.1),
+            max_delay: timedelta = timedelta(seconds=30),
+            multiplier: float = 2.0,
+            jitter: str = RetryPolicyJitters.full,
+            deadline: timedelta | None = None,
+            retry_on_exceptions: tuple[type[BaseException], ...] = (Exception,),
+            not_retry_on_exceptions: tuple[type[BaseException], ...] = (),
+            retry_if_exception: Callable[[BaseException], bool] | None = None,
+            retry_on_statuses: set[int] | list[int] | None = None,
+            respect_retry_after: bool = True,
+            max_retry_after: timedelta = timedelta(minutes=5)
+    ):
+        raise_for_type(max_tries, int)
+        raise_for_type(base_delay, timedelta)
+        raise_for_type(max_delay, timedelta)
+        if deadline is not None:
+            raise_for_type(deadline, timedelta)
+        RetryPolicyJitters.parse_and_validate_values(jitter)
+        if max_tries < 1:
+            raise ValueError("max_tries < 1")
+        if multiplier < 1:
+            raise ValueError("multiplier < 1")
+        self.max_tries = max_tries
+        self.endlessly = endlessly
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline = deadline
+        self.retry_on_exceptions = retry_on_exceptions
+        self.not_retry_on_exceptions = not_retry_on_exceptions
+        self.retry_if_exception = retry_if_exception
+        if retry_on_statuses is None:
+            retry_on_statuses = {408, 425, 429, 500, 502, 503, 504}
+        self.retry_on_statuses = set(retry_on_statuses)
+        self.respect_retry_after = respect_retry_after
+        self.max_retry_after = max_retry_after
+
+    def is_exception_retryable(self, exception: BaseException) -> bool:
+        if self.not_retry_on_exceptions and isinstance(exception, self.not_retry_on_exceptions):
+            return False
+        if not isinstance(exception, self.retry_on_exceptions):
+            return False
+        if self.retry_if_exception is not None:
+            return bool(self.retry_if_exception(exception))
+        return True
+
+    def is_status_retryable(self, status: int) -> bool:
+        return status in self.retry_on_statuses
+
+    def compute_delay(self, *, tries: int, prev_delay: float | None = None) -> float:
+        # tries is number of already made tries, returns delay in seconds before next try
+        base = self.base_delay.total_seconds()
+        cap = self.max_delay.total_seconds()
+        if self.jitter == RetryPolicyJitters.decorrelated:
+            prev_delay = base if prev_delay is None else prev_delay
+            return min(cap, random.uniform(base, max(base, prev_delay * 3)))
+        try:
+            delay = min(cap, base * (self.multiplier ** (max(tries, 1) - 1)))
+        except OverflowError:
+            delay = cap
+        if self.jitter == RetryPolicyJitters.full:
+            return random.uniform(0, delay)
+        return delay
+
+    def make_state(self) -> "RetryState":
+        return RetryState(retry_policy=self)
+
+
+class RetryState:
+
+    def __init__(self, *, retry_policy: RetryPolicy):
+        self.retry_policy = retry_policy
+        self.tries = 0
+        self.started_at = time.monotonic()
+        self.prev_delay: float | None = None
+
+    def get_elapsed(self) -> timedelta:
+        return timedelta(seconds=time.monotonic() - self.started_at)
+
+    def next_delay(
+            self,
+            *,
+            exception: BaseException | None = None,
+            status: int | None = None,
+            retry_after: timedelta | None = None
+    ) -> float | None:
+        # call after every failed try, returns delay in seconds or None if no more tries should be made
+        self.tries += 1
+        policy = self.retry_policy
+
+        if exception is not None and not policy.is_exception_retryable(exception):
+            return None
+        if status is not None and not policy.is_status_retryable(status):
+            return None
+        if not policy.endlessly and self.tries >= policy.max_tries:
+            return None
+
+        delay = policy.compute_delay(tries=self.tries, prev_delay=self.prev_delay)
+        if policy.respect_retry_after and retry_after is not None:
+            if retry_after > policy.max_retry_after:
+                return None
+            delay = max(delay, retry_after.total_seconds())
+
+        if policy.deadline is not None:
+            if self.get_elapsed().total_seconds() + delay > policy.deadline.total_seconds():
+                return None
+
+        self.prev_delay = delay
+        return delay
 
 
 async def async_retry_func(
@@ -16,16 +167,26 @@ async def async_retry_func(
         max_tries: int = 5,
         endlessly: bool = False,
         timeout_after_exception: timedelta | None = None,
-        raise_if_exception: bool = True
+        raise_if_exception: bool = True,
+        retry_policy: RetryPolicy | None = None
 ):
     tries = 0
     async_func_args = async_func_args or ()
     async_func_kwargs = async_func_kwargs or {}
+    retry_state = retry_policy.make_state() if retry_policy is not None else None
 
     while True:
         try:
             return await async_func(*async_func_args, **async_func_kwargs)
         except Exception as exception:
+            if retry_state is not None:
+                delay = retry_state.next_delay(exception=exception)
+                if delay is None:
+                    if raise_if_exception:
+                        raise exception
+                    return None
+                await async_safe_sleep(delay)
+                continue
             tries += 1
             if not endlessly and tries >= max_tries:
                 if raise_if_exception:
@@ -43,16 +204,26 @@ def sync_retry_func(
         max_tries: int = 5,
         endlessly: bool = False,
         timeout_after_exception: timedelta | None = None,
-        raise_if_exception: bool = True
+        raise_if_exception: bool = True,
+        retry_policy: RetryPolicy | None = None
 ):
     tries = 0
     sync_func_args = sync_func_args or ()
     sync_func_kwargs = sync_func_kwargs or {}
+    retry_state = retry_policy.make_state() if retry_policy is not None else None
 
     while True:
         try:
             return sync_func(*sync_func_args, **sync_func_kwargs)
         except Exception as exception:
+            if retry_state is not None:
+                delay = retry_state.next_delay(exception=exception)
+                if delay is None:
+                    if raise_if_exception:
+                        raise exception
+                    return None
+                sync_safe_sleep(delay)
+                continue
             tries += 1
             if not endlessly and tries >= max_tries:
                 if raise_if_exception:
@@ -1,7 +1,40 @@
 # arpakitlib
 
+import os
+import time
 import uuid
 
+_CROCKFORD_BASE32_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
 
 def uuid4_as_str() -> str:
     return str(uuid.uuid4())
+
+
+def generate_uuid7() -> uuid.UUID:
+    if hasattr(uuid, "uuid7"):
+        return uuid.uuid7()
+    # RFC 9562: 48 bits unix ts in ms, 4 bits version, 12 + 62 random bits, 2 bits variant
+    unix_ts_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (unix_ts_ms & 0xFFFF_FFFF_FFFF) << 80
+    value |= 0x7 << 76
+    value |= ((rand >> 62) & 0xFFF) << 64
+    value |= 0b10 << 62
+    value |= rand & 0x3FFF_FFFF_FFFF_FFFF
+    return uuid.UUID(int=value)
+
+
+def uuid7_as_str() -> str:
+    return str(generate_uuid7())
+
+
+def generate_ulid() -> str:
+    # 48 bits unix ts in ms + 80 random bits, crockford base32, 26 chars
+    value = ((time.time_ns() // 1_000_000) & 0xFFFF_FFFF_FFFF) << 80
+    value |= int.from_bytes(os.urandom(10), "big")
+    chars = []
+    for _ in range(26):
+        chars.append(_CROCKFORD_BASE32_ALPHABET[value & 0x1F])
+        value >>= 5
+    return "".join(reversed(chars))
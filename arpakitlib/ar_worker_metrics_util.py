@@ -0,0 +1,274 @@
+# arpakit
+
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any
+
+from arpakitlib.ar_datetime_util import now_utc_dt
+
+DEFAULT_WORKER_ITERATION_DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+
+class WorkerMetrics:
+
+    def __init__(
+            self,
+            *,
+            duration_buckets: tuple[float, ...] = DEFAULT_WORKER_ITERATION_DURATION_BUCKETS,
+            max_profiles: int = 10
+    ):
+        self.duration_buckets = tuple(sorted(duration_buckets))
+        self._lock = threading.Lock()
+        self._iterations_total = 0
+        self._iterations_failed_total = 0
+        self._work_done_total = 0
+        self._slow_iterations_total = 0
+        self._duration_bucket_counts = [0] * len(self.duration_buckets)
+        self._duration_sum = 0.0
+        self._last_iteration_duration: float | None = None
+        self._last_success_dt: datetime | None = None
+        self._last_error_dt: datetime | None = None
+        self._sleep_seconds_total = 0.0
+        self._in_progress = 0
+        self._current_timeout_after_run: float | None = None
+        self._profiles: deque[dict[str, Any]] = deque(maxlen=max_profiles)
+
+    def on_iteration_start(self):
+        with self._lock:
+            self._in_progress += 1
+
+    def on_iteration_finish(self, *, duration: float, is_ok: bool, work_done: int | None = None, is_slow: bool = False):
+        with self._lock:
+            self._in_progress -= 1
+            self._iterations_total += 1
+            if is_ok:
+                self._last_success_dt = now_utc_dt()
+            else:
+                self._iterations_failed_total += 1
+                self._last_error_dt = now_utc_dt()
+            if work_done is not None:
+                self._work_done_total += work_done
+            if is_slow:
+                self._slow_iterations_total += 1
+            self._duration_sum += duration
+            self._last_iteration_duration = duration
+            for i, bucket in enumerate(self.duration_buckets):
+                if duration <= bucket:
+                    self._duration_bucket_counts[i] += 1
+
+    def on_iteration_cancel(self):
+        with self._lock:
+            self._in_progress -= 1
+
+    def on_sleep(self, seconds: float):
+        with self._lock:
+            self._sleep_seconds_total += seconds
+
+    def set_current_timeout_after_run(self, seconds: float):
+        with self._lock:
+            self._current_timeout_after_run = seconds
+
+    def add_profile(self, *, duration: float, profile_text: str):
+        with self._lock:
+            self._profiles.append({"dt": now_utc_dt(), "duration": duration, "profile_text": profile_text})
+
+    def get_snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "iterations_total": self._iterations_total,
+                "iterations_failed_total": self._iterations_failed_total,
+                "work_done_total": self._work_done_total,
+                "slow_iterations_total": self._slow_iterations_total,
+                "iteration_duration_buckets": {
+                    bucket: count for bucket, count in zip(self.duration_buckets, self._duration_bucket_counts)
+                },
+                "iteration_duration_sum": self._duration_sum,
+                "last_iteration_duration": self._last_iteration_duration,
+                "last_success_dt": self._last_success_dt,
+                "last_error_dt": self._last_error_dt,
+                "sleep_seconds_total": self._sleep_seconds_total,
+                "in_progress": self._in_progress,
+                "current_timeout_after_run": self._current_timeout_after_run,
+                "profiles": list(self._profiles)
+            }
+
+
+class WorkerIterationProfiler:
+
+    def __init__(self, *, sort_by: str = "cumulative", limit: int = 30):
+        # only one iteration is profiled at a time, cProfile can not be enabled twice
+        self.sort_by = sort_by
+        self.limit = limit
+        self._lock = threading.Lock()
+
+    def start(self) -> cProfile.Profile | None:
+        if not self._lock.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # other profiler is active
+            self._lock.release()
+            return None
+        return profile
+
+    def finish(self, profile: cProfile.Profile) -> str:
+        try:
+            profile.disable()
+        finally:
+            self._lock.release()
+        stream = io.StringIO()
+        pstats.Stats(profile, stream=stream).sort_stats(self.sort_by).print_stats(self.limit)
+        return stream.getvalue()
+
+
+class BaseWorkerMetricsExporter:
+
+    def export(self, *, worker_name: str, worker_id: str, snapshot: dict[str, Any]):
+        raise NotImplementedError()
+
+
+class InMemoryWorkerMetricsExporter(BaseWorkerMetricsExporter):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._worker_key_to_snapshot: dict[tuple[str, str], dict[str, Any]] = {}
+
+    def export(self, *, worker_name: str, worker_id: str, snapshot: dict[str, Any]):
+        with self._lock:
+            self._worker_key_to_snapshot[(worker_name, worker_id)] = snapshot
+
+    def get_snapshots(self) -> dict[tuple[str, str], dict[str, Any]]:
+        with self._lock:
+            return dict(self._worker_key_to_snapshot)
+
+
+class LogWorkerMetricsExporter(BaseWorkerMetricsExporter):
+
+    def __init__(self, *, logger: logging.Logger | None = None, level: int = logging.INFO):
+        self._logger = logger if logger is not None else logging.getLogger(self.__class__.__name__)
+        self.level = level
+
+    def export(self, *, worker_name: str, worker_id: str, snapshot: dict[str, Any]):
+        iterations_total = snapshot["iterations_total"]
+        avg_duration = (snapshot["iteration_duration_sum"] / iterations_total) if iterations_total else 0.0
+        self._logger.log(
+            self.level,
+            f"worker_metrics worker_name={worker_name} worker_id={worker_id}"
+            f" iterations_total={iterations_total}"
+            f" iterations_failed_total={snapshot['iterations_failed_total']}"
+            f" work_done_total={snapshot['work_done_total']}"
+            f" slow_iterations_total={snapshot['slow_iterations_total']}"
+            f" avg_iteration_duration={avg_duration:.6f}"
+            f" last_iteration_duration={snapshot['last_iteration_duration']}"
+            f" sleep_seconds_total={snapshot['sleep_seconds_total']:.3f}"
+            f" current_timeout_after_run={snapshot['current_timeout_after_run']}"
+            f" last_success_dt={snapshot['last_success_dt'].isoformat() if snapshot['last_success_dt'] else None}"
+        )
+
+
+def _escape_prometheus_label_value(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def make_worker_metrics_prometheus_text(
+        *,
+        worker_key_to_snapshot: dict[tuple[str, str], dict[str, Any]],
+        prefix: str = "arpakitlib_worker"
+) -> str:
+    def _labels(worker_name: str, worker_id: str, **extra: str) -> str:
+        labels = {"worker_name": worker_name, "worker_id": worker_id, **extra}
+        return "{" + ",".join(f'{k}="{_escape_prometheus_label_value(v)}"' for k, v in labels.items()) + "}"
+
+    lines = []
+    counters = [
+        ("iterations_total", "counter", "Count of finished iterations"),
+        ("iterations_failed_total", "counter", "Count of iterations with exception"),
+        ("work_done_total", "counter", "Sum of work counts returned by run"),
+        ("slow_iterations_total", "counter", "Count of slow iterations"),
+        ("sleep_seconds_total", "counter", "Seconds spent waiting between iterations"),
+        ("in_progress", "gauge", "Iterations in progress"),
+        ("current_timeout_after_run", "gauge", "Current timeout after run in seconds"),
+        ("last_iteration_duration", "gauge", "Duration of last iteration in seconds"),
+    ]
+    for name, metric_type, help_text in counters:
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+        for (worker_name, worker_id), snapshot in worker_key_to_snapshot.items():
+            if snapshot[name] is None:
+                continue
+            lines.append(f"{prefix}_{name}{_labels(worker_name, worker_id)} {float(snapshot[name])}")
+
+    lines.append(f"# HELP {prefix}_last_success_timestamp_seconds Unix time of last successful iteration")
+    lines.append(f"# TYPE {prefix}_last_success_timestamp_seconds gauge")
+    for (worker_name, worker_id), snapshot in worker_key_to_snapshot.items():
+        if snapshot["last_success_dt"] is not None:
+            lines.append(
+                f"{prefix}_last_success_timestamp_seconds{_labels(worker_name, worker_id)}"
+                f" {snapshot['last_success_dt'].timestamp()}"
+            )
+
+    lines.append(f"# HELP {prefix}_iteration_duration_seconds Duration of iterations")
+    lines.append(f"# TYPE {prefix}_iteration_duration_seconds histogram")
+    for (worker_name, worker_id), snapshot in worker_key_to_snapshot.items():
+        for bucket, count in snapshot["iteration_duration_buckets"].items():
+            lines.append(
+                f"{prefix}_iteration_duration_seconds_bucket{_labels(worker_name, worker_id, le=str(bucket))} {count}"
+            )
+        lines.append(
+            f"{prefix}_iteration_duration_seconds_bucket{_labels(worker_name, worker_id, le='+Inf')}"
+            f" {snapshot['iterations_total']}"
+        )
+        lines.append(
+            f"{prefix}_iteration_duration_seconds_sum{_labels(worker_name, worker_id)}"
+            f" {snapshot['iteration_duration_sum']}"
+        )
+        lines.append(
+            f"{prefix}_iteration_duration_seconds_count{_labels(worker_name, worker_id)}"
+            f" {snapshot['iterations_total']}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusTextWorkerMetricsExporter(InMemoryWorkerMetricsExporter):
+
+    def __init__(self, *, filepath: str | None = None, prefix: str = "arpakitlib_worker"):
+        # render() gives text for /metrics endpoint,
+        # with filepath text is written atomically on every export (e.g. for node_exporter textfile collector)
+        super().__init__()
+        self.filepath = filepath
+        self.prefix = prefix
+
+    def render(self) -> str:
+        return make_worker_metrics_prometheus_text(worker_key_to_snapshot=self.get_snapshots(), prefix=self.prefix)
+
+    def export(self, *, worker_name: str, worker_id: str, snapshot: dict[str, Any]):
+        super().export(worker_name=worker_name, worker_id=worker_id, snapshot=snapshot)
+        if self.filepath is None:
+            return
+        tmp_filepath = f"{self.filepath}.{os.getpid()}.tmp"
+        with open(tmp_filepath, mode="w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_filepath, self.filepath)
+
+
+def __example():
+    pass
+
+
+async def __async_example():
+    pass
+
+
+if __name__ == '__main__':
+    __example()
+    asyncio.run(__async_example())
@@ -0,0 +1,314 @@
+# arpakit
+
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+from abc import ABC
+from typing import Any
+
+
+class BaseWorkerWakeupSource(ABC):
+    # wait returns True if woken by notification and False on timeout
+
+    is_sync_supported: bool = True
+
+    def __init__(self):
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def sync_startup(self):
+        pass
+
+    def sync_shutdown(self):
+        pass
+
+    def sync_wait(self, timeout: float) -> bool:
+        raise NotImplementedError()
+
+    async def async_startup(self):
+        pass
+
+    async def async_shutdown(self):
+        pass
+
+    async def async_wait(self, timeout: float) -> bool:
+        raise NotImplementedError()
+
+
+class EventWorkerWakeupSource(BaseWorkerWakeupSource):
+
+    def __init__(self):
+        # in-process wakeup, notify() can be called from any thread
+        super().__init__()
+        self._sync_event = threading.Event()
+        self._async_event: asyncio.Event | None = None
+        self._async_loop: asyncio.AbstractEventLoop | None = None
+
+    def notify(self):
+        self._sync_event.set()
+        if self._async_loop is not None and self._async_event is not None:
+            try:
+                self._async_loop.call_soon_threadsafe(self._async_event.set)
+            except RuntimeError:  # loop is closed
+                pass
+
+    def sync_wait(self, timeout: float) -> bool:
+        res = self._sync_event.wait(timeout)
+        self._sync_event.clear()
+        return res
+
+    async def async_startup(self):
+        self._async_loop = asyncio.get_running_loop()
+        self._async_event = asyncio.Event()
+        if self._sync_event.is_set():
+            self._async_event.set()
+
+    async def async_wait(self, timeout: float) -> bool:
+        if self._async_event is None:
+            await self.async_startup()
+        try:
+            await asyncio.wait_for(self._async_event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._async_event.clear()
+        self._sync_event.clear()
+        return True
+
+
+class UnixSocketWorkerWakeupSource(BaseWorkerWakeupSource):
+
+    def __init__(self, *, socket_path: str):
+        # any datagram sent to socket_path wakes worker, see notify_unix_socket_worker_wakeup
+        super().__init__()
+        self.socket_path = socket_path
+        self._socket: socket.socket | None = None
+
+    def _open(self, *, blocking: bool):
+        if self._socket is not None:
+            return
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self.socket_path)
+        self._socket.setblocking(blocking)
+
+    def _close(self):
+        if self._socket is None:
+            return
+        self._socket.close()
+        self._socket = None
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def _drain(self):
+        self._socket.setblocking(False)
+        try:
+            while True:
+                self._socket.recv(1024)
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def sync_startup(self):
+        self._open(blocking=True)
+
+    def sync_shutdown(self):
+        self._close()
+
+    def sync_wait(self, timeout: float) -> bool:
+        self._open(blocking=True)
+        self._socket.settimeout(timeout)
+        try:
+            self._socket.recv(1024)
+        except socket.timeout:
+            return False
+        self._drain()
+        return True
+
+    async def async_startup(self):
+        self._open(blocking=False)
+
+    async def async_shutdown(self):
+        self._close()
+
+    async def async_wait(self, timeout: float) -> bool:
+        self._open(blocking=False)
+        self._socket.setblocking(False)
+        try:
+            await asyncio.wait_for(asyncio.get_running_loop().sock_recv(self._socket, 1024), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._drain()
+        return True
+
+
+def notify_unix_socket_worker_wakeup(*, socket_path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        try:
+            sock.sendto(b"1", socket_path)
+        except (FileNotFoundError, ConnectionRefusedError, BlockingIOError):
+            return False
+    return True
+
+
+class PostgreSQLNotifyWorkerWakeupSource(BaseWorkerWakeupSource):
+
+    is_sync_supported = False
+
+    def __init__(self, *, postgresql_url: str, channel: str):
+        # LISTEN channel with asyncpg, only for async workers, wakeup is made by NOTIFY channel
+        super().__init__()
+        self.postgresql_url = postgresql_url
+        self.channel = channel
+        self._connection: Any | None = None
+        self._async_event: asyncio.Event | None = None
+
+    def _on_notification(self, *args):
+        self._async_event.set()
+
+    async def async_startup(self):
+        import asyncpg
+
+        if self._async_event is None:
+            self._async_event = asyncio.Event()
+        if self._connection is not None and not self._connection.is_closed():
+            return
+        self._connection = await asyncpg.connect(self.postgresql_url)
+        await self._connection.add_listener(self.channel, self._on_notification)
+        # notifications can be missed while not connected
+        self._async_event.set()
+
+    async def async_shutdown(self):
+        if self._connection is None:
+            return
+        if not self._connection.is_closed():
+            try:
+                await self._connection.remove_listener(self.channel, self._on_notification)
+            finally:
+                await self._connection.close()
+        self._connection = None
+
+    async def async_wait(self, timeout: float) -> bool:
+        try:
+            await self.async_startup()
+        except Exception as exception:
+            self._logger.error("can not listen, sleeping", exc_info=exception)
+            await asyncio.sleep(timeout)
+            return False
+        try:
+            await asyncio.wait_for(self._async_event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._async_event.clear()
+        return True
+
+    def sync_startup(self):
+        raise ValueError("PostgreSQLNotifyWorkerWakeupSource works only with async workers")
+
+    def sync_wait(self, timeout: float) -> bool:
+        raise ValueError("PostgreSQLNotifyWorkerWakeupSource works only with async workers")
+
+
+async def async_notify_postgresql_worker_wakeup(*, connection: Any, channel: str, payload: str = ""):
+    # connection is asyncpg connection
+    await connection.execute("SELECT pg_notify($1, $2)", channel, payload)
+
+
+class RedisPubSubWorkerWakeupSource(BaseWorkerWakeupSource):
+
+    def __init__(self, *, redis_url: str, channel: str):
+        # any message published to channel wakes worker,
+        # on connection error connection is reset and wait sleeps for timeout, next wait reconnects
+        super().__init__()
+        self.redis_url = redis_url
+        self.channel = channel
+        self._sync_redis: Any | None = None
+        self._sync_pubsub: Any | None = None
+        self._async_redis: Any | None = None
+        self._async_pubsub: Any | None = None
+
+    def sync_startup(self):
+        import redis
+
+        if self._sync_pubsub is not None:
+            return
+        self._sync_redis = redis.Redis.from_url(self.redis_url)
+        self._sync_pubsub = self._sync_redis.pubsub(ignore_subscribe_messages=True)
+        self._sync_pubsub.subscribe(self.channel)
+
+    def sync_shutdown(self):
+        if self._sync_pubsub is not None:
+            self._sync_pubsub.close()
+            self._sync_pubsub = None
+        if self._sync_redis is not None:
+            self._sync_redis.close()
+            self._sync_redis = None
+
+    def sync_wait(self, timeout: float) -> bool:
+        try:
+            self.sync_startup()
+            message = self._sync_pubsub.get_message(timeout=timeout)
+            if message is None:
+                return False
+            while self._sync_pubsub.get_message(timeout=0) is not None:
+                pass
+        except Exception as exception:
+            self._logger.error("can not get message, sleeping", exc_info=exception)
+            try:
+                self.sync_shutdown()
+            except Exception:
+                self._sync_pubsub = None
+                self._sync_redis = None
+            time.sleep(timeout)
+            return False
+        return True
+
+    async def async_startup(self):
+        import redis.asyncio
+
+        if self._async_pubsub is not None:
+            return
+        self._async_redis = redis.asyncio.Redis.from_url(self.redis_url)
+        self._async_pubsub = self._async_redis.pubsub(ignore_subscribe_messages=True)
+        await self._async_pubsub.subscribe(self.channel)
+
+    async def async_shutdown(self):
+        if self._async_pubsub is not None:
+            await self._async_pubsub.aclose()
+            self._async_pubsub = None
+        if self._async_redis is not None:
+            await self._async_redis.aclose()
+            self._async_redis = None
+
+    async def async_wait(self, timeout: float) -> bool:
+        try:
+            await self.async_startup()
+            message = await self._async_pubsub.get_message(timeout=timeout)
+            if message is None:
+                return False
+            while await self._async_pubsub.get_message(timeout=0) is not None:
+                pass
+        except Exception as exception:
+            self._logger.error("can not get message, sleeping", exc_info=exception)
+            try:
+                await self.async_shutdown()
+            except Exception:
+                self._async_pubsub = None
+                self._async_redis = None
+            await asyncio.sleep(timeout)
+            return False
+        return True
+
+
+def __example():
+    pass
+
+
+async def __async_example():
+    pass
+
+
+if __name__ == '__main__':
+    __example()
+    asyncio.run(__async_example())
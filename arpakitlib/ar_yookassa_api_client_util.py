@@ -9,9 +9,7 @@ from typing import Any
 import aiohttp
 import requests
 from arpakitlib.ar_base_http_api_client_util import BaseHTTPAPIClient
-from arpakitlib.ar_dict_util import combine_dicts
 from arpakitlib.ar_enumeration_util import Enumeration
-from arpakitlib.ar_http_request_util import sync_make_http_request, async_make_http_request
 from arpakitlib.ar_type_util import raise_for_type
 
 """
@@ -28,9 +26,11 @@ class EasyYookassaAPIClient(BaseHTTPAPIClient):
 
     def __init__(
             self, *, secret_key: str, shop_id: int, timeout: timedelta = timedelta(seconds=7),
-            proxy_url: str | None = None
+            proxy_url: str | None = None,
+            **kwargs
     ):
-        super().__init__()
+        # kwargs are passed to BaseHTTPAPIClient (session pools, retry_policy, circuit_breaker_registry)
+        super().__init__(**kwargs)
         self.secret_key = secret_key
         self.shop_id = shop_id
         self.headers = {"Content-Type": "application/json"}
@@ -38,6 +38,9 @@ class EasyYookassaAPIClient(BaseHTTPAPIClient):
         self.timeout = timeout
         self.proxy_url = proxy_url
 
+    def _get_http_response_cache_scope(self) -> str | None:
+        return f"{self.shop_id}:{self.secret_key}"
+
     def _sync_make_http_request(
             self,
             *,
@@ -47,10 +50,10 @@ class EasyYookassaAPIClient(BaseHTTPAPIClient):
             not_raise_for_statuses_: list[int] | set[int] | None = None,
             **kwargs
     ) -> requests.Response:
-        return sync_make_http_request(
+        return super()._sync_make_http_request(
             method=method,
             url=url,
-            headers=combine_dicts(self.headers, (headers if headers is not None else {})),
+            headers=headers,
             max_tries_=1,
             raise_for_status_=True,
             timeout_=self.timeout,
@@ -70,10 +73,10 @@ class EasyYookassaAPIClient(BaseHTTPAPIClient):
             not_raise_for_statuses_: list[int] | set[int] | None = None,
             **kwargs
     ) -> aiohttp.ClientResponse:
-        return await async_make_http_request(
+        return await super()._async_make_http_request(
             method=method,
             url=url,
-            headers=combine_dicts(self.headers, (headers if headers is not None else {})),
+            headers=headers,
             max_tries_=1,
             raise_for_status_=True,
             not_raise_for_statuses_=not_raise_for_statuses_,
@@ -0,0 +1,41 @@
+import asyncio
+import os
+import tempfile
+import time
+
+from arpakitlib.ar_json_db_util import JSONDbFile, AsyncJSONDbFile
+
+
+async def __async_benchmark_coalesced_writes(records_count: int = 100_000, writes_count: int = 1000):
+    with tempfile.TemporaryDirectory() as dirpath:
+        records = {str(i): {"value": i} for i in range(records_count)}
+
+        json_db_file = JSONDbFile(filepath=os.path.join(dirpath, "transaction.json"))
+        json_db_file.write_json_data(dict(records))
+        json_db_file.count_records()
+        start = time.perf_counter()
+        with json_db_file.transaction():
+            for i in range(writes_count):
+                json_db_file.create_record(record={"value": i}, record_id=f"new_{i}")
+        transaction_seconds = time.perf_counter() - start
+
+        async_json_db_file = AsyncJSONDbFile(filepath=os.path.join(dirpath, "coalesced.json"))
+        async_json_db_file.json_db_file.write_json_data(dict(records))
+        await async_json_db_file.count_records()
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            async_json_db_file.create_record(record={"value": i}, record_id=f"new_{i}")
+            for i in range(writes_count)
+        ])
+        coalesced_seconds = time.perf_counter() - start
+
+        print(
+            f"records={records_count}, writes={writes_count}, "
+            f"one transaction={transaction_seconds * 1000:.1f}ms, "
+            f"coalesced={coalesced_seconds * 1000:.1f}ms, "
+            f"flushes={async_json_db_file.executor.flushes_count}"
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(__async_benchmark_coalesced_writes())
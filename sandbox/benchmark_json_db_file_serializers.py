@@ -0,0 +1,42 @@
+import os
+import tempfile
+import time
+
+from arpakitlib.ar_json_db_util import JSONDbFile, JSONDbFileSerializers
+
+
+def __benchmark_json_db_file_serializers(records_count: int = 100_000, repeats: int = 5):
+    records = {
+        str(i): {"name": f"name_{i}", "value": i, "tags": ["a", "b", "c"], "data": {"x": i / 3, "y": None}}
+        for i in range(records_count)
+    }
+
+    with tempfile.TemporaryDirectory() as dirpath:
+        for beautify_json in (False, True):
+            for serializer in JSONDbFileSerializers.values_list():
+                json_db_file = JSONDbFile(
+                    filepath=os.path.join(dirpath, f"{serializer}_{beautify_json}.json"),
+                    use_memory=False,
+                    beautify_json=beautify_json,
+                    serializer=serializer
+                )
+
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    json_db_file.write_json_data(records)
+                write_seconds = (time.perf_counter() - start) / repeats
+
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    json_db_file.read_json_data()
+                read_seconds = (time.perf_counter() - start) / repeats
+
+                print(
+                    f"records={records_count}, beautify_json={beautify_json}, serializer={serializer}, "
+                    f"size={os.path.getsize(json_db_file.filepath)}, "
+                    f"write={write_seconds * 1000:.1f}ms, read={read_seconds * 1000:.1f}ms"
+                )
+
+
+if __name__ == '__main__':
+    __benchmark_json_db_file_serializers()
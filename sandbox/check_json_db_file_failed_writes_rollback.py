@@ -0,0 +1,50 @@
+import asyncio
+import os
+import tempfile
+
+from arpakitlib.ar_json_db_util import JSONDbFile, AsyncJSONDbFile
+
+
+def __check_nested_transaction_rollback():
+    with tempfile.TemporaryDirectory() as dirpath:
+        filepath = os.path.join(dirpath, "db.json")
+        json_db_file = JSONDbFile(filepath=filepath)
+        json_db_file.create_record(record={"a": 1}, record_id="dup")
+
+        with json_db_file.transaction():
+            try:
+                json_db_file.bulk_create_records(records=[{"a": 2}, {"a": 3}], record_ids=["n1", "dup"])
+            except KeyError:
+                pass
+
+        assert JSONDbFile(filepath=filepath).get_record_ids() == ["dup"]
+        print("nested transaction rollback: ok")
+
+
+async def __async_check_coalesced_write_rollback():
+    with tempfile.TemporaryDirectory() as dirpath:
+        filepath = os.path.join(dirpath, "db.json")
+        async_json_db_file = AsyncJSONDbFile(filepath=filepath)
+        await async_json_db_file.create_record(record={"a": 1}, record_id="dup")
+
+        def _write_with_error():
+            json_db_file.create_record(record={"a": 2}, record_id="n1")
+            json_db_file.create_record(record={"a": 3}, record_id="dup")
+
+        # both writes are applied in one coalesced transaction
+        json_db_file = async_json_db_file.json_db_file
+        failed_res, ok_res = await asyncio.gather(
+            async_json_db_file.executor.run_write(_write_with_error),
+            async_json_db_file.create_record(record={"a": 4}, record_id="ok"),
+            return_exceptions=True
+        )
+
+        assert isinstance(failed_res, KeyError)
+        assert not isinstance(ok_res, BaseException)
+        assert sorted(JSONDbFile(filepath=filepath).get_record_ids()) == ["dup", "ok"]
+        print("coalesced write rollback: ok")
+
+
+if __name__ == '__main__':
+    __check_nested_transaction_rollback()
+    asyncio.run(__async_check_coalesced_write_rollback())